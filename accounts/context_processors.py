@@ -1,11 +1,11 @@
-from django.contrib.auth import get_user_model
+from .session_user import get_session_user
 
 
 def current_user(request):
     """Context processor that exposes `current_user` to templates.
 
     It prefers `request.user` (set by authentication or SessionUserMiddleware),
-    but will attempt to resolve from session['user_id'] as a fallback.
+    but falls back to the session user, which is resolved once per request.
     """
     user = None
     try:
@@ -16,16 +16,4 @@ def current_user(request):
     if user and getattr(user, "is_authenticated", False):
         return {"current_user": user}
 
-    # fallback: try to resolve from session
-    user_id = request.session.get("user_id")
-    if not user_id:
-        return {"current_user": None}
-
-    User = get_user_model()
-    try:
-        user = User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        user = None
-
-    return {"current_user": user}
-
+    return {"current_user": get_session_user(request)}
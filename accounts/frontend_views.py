@@ -8,6 +8,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib import messages
 from .forms import RegisterForm, LoginForm, ForgotPasswordForm, ResetPasswordForm
 from django.views.decorators.csrf import ensure_csrf_cookie
+from .session_user import get_session_user
 
 # API base (used by some frontend views). Prefer internal auth where possible.
 API_BASE_URL = "http://127.0.0.1:8000/api/auth"
@@ -195,8 +196,7 @@ def change_password_view(request):
     if not user_id:
         return redirect("login_page")
 
-    User = get_user_model()
-    user = User.objects.filter(id=user_id).first()
+    user = get_session_user(request)
     if not user:
         return redirect("login_page")
 
@@ -232,8 +232,7 @@ def edit_email_view(request):
     if not user_id:
         return redirect("login_page")
 
-    User = get_user_model()
-    user = User.objects.filter(id=user_id).first()
+    user = get_session_user(request)
     if not user:
         return redirect("login_page")
 
@@ -250,7 +249,7 @@ def edit_email_view(request):
             return redirect(reverse('dashboard'))
 
         # check uniqueness
-        existing = User.objects.filter(email__iexact=new_email.strip()).exclude(id=user.id).first()
+        existing = get_user_model().objects.filter(email__iexact=new_email.strip()).exclude(id=user.id).first()
         if existing:
             messages.error(request, "Email already in use")
             return redirect(reverse('dashboard'))
@@ -1,16 +1,6 @@
 from django.utils.functional import SimpleLazyObject
-from django.contrib.auth import get_user_model
 
-
-def get_user_from_session(request):
-    user_id = request.session.get("user_id")
-    if not user_id:
-        return None
-    User = get_user_model()
-    try:
-        return User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        return None
+from .session_user import get_session_user
 
 
 class SessionUserMiddleware:
@@ -22,6 +12,6 @@ class SessionUserMiddleware:
     def __call__(self, request):
         # preserve any existing user value to avoid recursive lookup
         original_user = getattr(request, "user", None)
-        request.user = SimpleLazyObject(lambda: get_user_from_session(request) or original_user)
+        request.user = SimpleLazyObject(lambda: get_session_user(request) or original_user)
         response = self.get_response(request)
         return response
@@ -0,0 +1,57 @@
+"""
+Request-scoped resolution of the session user.
+
+Frontend pages identify the user by ``session["user_id"]``. The user is
+resolved at most once per request (the result is kept on the request) and
+served from a short-lived, size-bounded per-process cache, so the
+middleware, the ``current_user`` context processor and the views share
+one lookup, and most requests need none. Saving or deleting a user drops it from the
+cache of the process that did it (see ``accounts.signals``); other
+processes pick the change up within ``USER_TTL`` seconds.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+
+USER_TTL = 30
+# Least recently used users beyond this are dropped, expired or not
+MAX_USERS = 1024
+
+_users = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_cached_user(user_id):
+    """A private copy of the user ``user_id``, or None if there is no such user."""
+    now = time.monotonic()
+    with _lock:
+        cached = _users.get(user_id)
+        if cached is not None:
+            _users.move_to_end(user_id)
+    if cached is None or cached[0] <= now:
+        user = get_user_model().objects.filter(id=user_id).first()
+        with _lock:
+            _users[user_id] = (now + USER_TTL, user)
+            _users.move_to_end(user_id)
+            while len(_users) > MAX_USERS:
+                _users.popitem(last=False)
+    else:
+        user = cached[1]
+    # Views change and save the user, so never hand out the shared instance
+    return copy.deepcopy(user)
+
+
+def forget_user(user_id):
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def get_session_user(request):
+    """The user of ``session["user_id"]``, looked up once per request; None if logged out."""
+    if not hasattr(request, "_session_user"):
+        user_id = request.session.get("user_id")
+        request._session_user = get_cached_user(user_id) if user_id else None
+    return request._session_user
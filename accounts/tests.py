@@ -1,3 +1,36 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from .models import User
+from .session_user import forget_user
+
+
+class SessionUserTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="u", email="u@example.com", password="x")
+        forget_user(self.user.id)
+        session = self.client.session
+        session["user_id"] = self.user.id
+        session.save()
+
+    def user_queries(self, path):
+        table = User._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return sum(f'FROM "{table}"' in query["sql"] for query in queries.captured_queries)
+
+    def test_one_user_lookup_per_request_then_none(self):
+        # Middleware, context processor and view share the first lookup
+        self.assertEqual(self.user_queries("/change-password/"), 1)
+        self.assertEqual(self.user_queries("/edit-email/"), 0)
+        self.assertEqual(self.user_queries("/dashboard/"), 0)
+        self.assertEqual(self.user_queries("/attempted/"), 0)
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        self.user_queries("/edit-email/")
+        self.client.post("/edit-email/", {"old_email": "u@example.com", "new_email": "new@example.com"})
+        self.assertEqual(self.user_queries("/edit-email/"), 1)
+        response = self.client.get("/edit-email/")
+        self.assertEqual(response.context["current_email"], "new@example.com")
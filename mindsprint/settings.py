@@ -129,6 +129,20 @@ else:
         }
     }
 # ----------------------------
+# CACHE
+# ----------------------------
+# Question pools, attempt contexts and other hot-path caches are shared
+# between workers through this cache. Set REDIS_URL in production (see
+# DEPLOYMENT.md); without it each process keeps its own local memory cache.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+
+# ----------------------------
 # STATIC & MEDIA FILES (Fixed & Consolidated)
 # ----------------------------
 STATIC_URL = "/static/"
@@ -164,6 +178,33 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# ----------------------------
+# TEST ATTEMPTS
+# ----------------------------
+# "rows" stores one AttemptCategory.question_set row per selected question,
+# "seed" stores only a random seed and a question pool snapshot per attempt.
+ATTEMPT_QUESTION_STORAGE = os.getenv("ATTEMPT_QUESTION_STORAGE", "rows")
+
+# "rows" stores one UserAnswer row per answered question,
+# "sheet" packs all answers of an attempt into a single AnswerSheet row.
+ANSWER_STORAGE = os.getenv("ANSWER_STORAGE", "rows")
+
+# Write-behind answer saving: answers land in a durable local buffer and are
+# written to the database in batches by `manage.py flush_answer_buffer --loop`.
+ANSWER_WRITE_BEHIND = os.getenv("ANSWER_WRITE_BEHIND", "False") == "True"
+ANSWER_BUFFER_BACKEND = "tests.answer_buffer.SQLiteAnswerBuffer"
+ANSWER_BUFFER_OPTIONS = {
+    "path": os.getenv("ANSWER_BUFFER_PATH", str(BASE_DIR / "answer_buffer.sqlite3")),
+}
+
+# Finished export jobs are written here by `manage.py run_export_jobs --loop`
+EXPORT_ROOT = os.getenv("EXPORT_ROOT", str(BASE_DIR / "exports"))
+# A running export without progress for this many seconds is failed as abandoned
+EXPORT_JOB_TIMEOUT = int(os.getenv("EXPORT_JOB_TIMEOUT", "900"))
+
+# Processes rendering per-test attempt archives (0 = up to 4, by CPU count)
+ARCHIVE_WORKERS = int(os.getenv("ARCHIVE_WORKERS", "0"))
+
 # ----------------------------
 # ADDITIONAL CONFIG
 # ----------------------------
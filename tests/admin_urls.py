@@ -7,7 +7,9 @@ from .views import (
                     AdminQuestionCategoryViewSet,
                     AdminQuestionViewSet,
                     AdminTestResultsAPIView,
-                    AdminTestResultsCSVExportAPIView        
+                    AdminExportJobsAPIView,
+                    AdminExportJobDetailAPIView,
+                    AdminExportJobDownloadAPIView,
                     )
 
 
@@ -46,5 +48,12 @@ urlpatterns = [
         AdminTestResultsCSVExportAPIView.as_view(),
         name="admin_results_export"
     ),
+    path("exports/", AdminExportJobsAPIView.as_view(), name="admin_exports"),
+    path("exports/<int:job_id>/", AdminExportJobDetailAPIView.as_view(), name="admin_export_detail"),
+    path(
+        "exports/<int:job_id>/download/",
+        AdminExportJobDownloadAPIView.as_view(),
+        name="admin_export_download"
+    ),
   
 ]
@@ -0,0 +1,232 @@
+"""
+Write-behind answer buffer.
+
+With ``ANSWER_WRITE_BEHIND`` enabled, answer saves are appended to a
+durable local buffer and the request returns straight away. A flusher
+(``manage.py flush_answer_buffer --loop``) drains the buffer in batches,
+keeps only the latest answer per (attempt, question) and writes them with
+bulk upserts. Scoring must call ``flush_attempt`` first so results never
+miss a buffered answer.
+
+The backend is pluggable through ``ANSWER_BUFFER_BACKEND``. The bundled
+SQLite stand-in lives on local disk, so every web worker and the flusher
+of a deployment must share one host; use a shared backend otherwise.
+"""
+import fcntl
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .answers import apply_counter_deltas, counter_delta, store_answers, upsert_answer_rows
+from .models import TestAttempt, UserAnswer
+
+
+DELETE_CHUNK = 500
+
+
+class AnswerBuffer:
+    """Interface every buffer backend implements."""
+
+    def append(self, attempt_id, answers):
+        """Durably store ``[(question_id, selected_option, correct_option, marks), ...]``."""
+        raise NotImplementedError
+
+    def drain(self, handler, attempt_id=None, limit=1000):
+        """
+        Pass up to ``limit`` buffered entries, oldest first, to ``handler`` as
+        ``[(attempt_id, question_id, selected_option, correct_option, marks), ...]`` and
+        forget them once it returns. Returns how many entries were drained.
+        """
+        raise NotImplementedError
+
+
+class SQLiteAnswerBuffer(AnswerBuffer):
+    """
+    Buffer kept in a local SQLite file (WAL, fsync on commit). Flushers take
+    an exclusive lock on a sibling ``.lock`` file instead of the database
+    write lock, so appends never wait for a flush.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buffered_answer ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " attempt_id INTEGER NOT NULL,"
+                " question_id INTEGER NOT NULL,"
+                " selected_option TEXT NOT NULL,"
+                " correct_option TEXT NOT NULL,"
+                " marks INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS buffered_answer_attempt ON buffered_answer (attempt_id, id)"
+            )
+            self.local.conn = conn
+        return conn
+
+    def append(self, attempt_id, answers):
+        self.connection().executemany(
+            "INSERT INTO buffered_answer (attempt_id, question_id, selected_option, correct_option, marks)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [(attempt_id, *answer) for answer in answers],
+        )
+
+    @contextmanager
+    def flush_lock(self):
+        # Serialises flushers only: two must never write an older answer over
+        # a newer one, nor count the same entry twice
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def drain(self, handler, attempt_id=None, limit=1000):
+        conn = self.connection()
+        where, params = ("WHERE attempt_id = ?", [attempt_id]) if attempt_id is not None else ("", [])
+
+        with self.flush_lock():
+            rows = conn.execute(
+                f"SELECT id, attempt_id, question_id, selected_option, correct_option, marks"
+                f" FROM buffered_answer {where} ORDER BY id LIMIT ?",
+                params + [limit],
+            ).fetchall()
+            if not rows:
+                return 0
+            # Written to the main database without holding the buffer's write lock
+            handler([row[1:] for row in rows])
+            ids = [row[0] for row in rows]
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for start in range(0, len(ids), DELETE_CHUNK):
+                    chunk = ids[start:start + DELETE_CHUNK]
+                    conn.execute(
+                        f"DELETE FROM buffered_answer WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def write_behind_enabled():
+    return getattr(settings, "ANSWER_WRITE_BEHIND", False)
+
+
+def get_answer_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                backend = import_string(settings.ANSWER_BUFFER_BACKEND)
+                _buffer = backend(**getattr(settings, "ANSWER_BUFFER_OPTIONS", {}))
+    return _buffer
+
+
+def save_answers(attempt_id, answers, sheet_order=None):
+    """
+    Buffer the answers when write-behind is on, otherwise write them now.
+
+    Returns False when the attempt turned out to be completed already.
+    """
+    if write_behind_enabled():
+        # The flusher drops answers of completed attempts, so never report them saved
+        if not TestAttempt.objects.filter(pk=attempt_id, status="ONGOING").exists():
+            return False
+        get_answer_buffer().append(attempt_id, answers)
+        return True
+    return store_answers(attempt_id, answers, sheet_order)
+
+
+def write_buffered(entries):
+    """Coalesce drained entries and bulk-write them to the database."""
+    latest = {}
+    for attempt_id, question_id, option, correct, marks in entries:
+        latest.setdefault(attempt_id, {})[question_id] = (option, correct, marks)
+
+    attempts = {
+        attempt.id: attempt
+        for attempt in TestAttempt.objects.filter(id__in=latest)
+        .only("id", "status", "uses_answer_sheet", "question_seed", "pool_snapshot_id")
+    }
+    rows = {}
+    sheets = {}
+    for attempt_id, answers in latest.items():
+        attempt = attempts.get(attempt_id)
+        # Answers that arrive after a submission must not change the result
+        if attempt is None or attempt.status == "COMPLETED":
+            continue
+        (sheets if attempt.uses_answer_sheet else rows)[attempt_id] = answers
+
+    with transaction.atomic():
+        # The flush lock serialises flushes, so the previous answers of every
+        # row-stored attempt in the batch can be read in one query
+        previous = {}
+        for attempt_id, question_id, option in UserAnswer.objects.filter(
+            attempt_id__in=rows
+        ).values_list("attempt_id", "question_id", "selected_option"):
+            if question_id in rows[attempt_id]:
+                previous.setdefault(attempt_id, {})[question_id] = option
+
+        upserts = []
+        deltas = {}
+        for attempt_id, answers in rows.items():
+            before = previous.get(attempt_id, {})
+            changed = {
+                question_id: answer
+                for question_id, answer in answers.items()
+                if before.get(question_id) != answer[0]
+            }
+            upserts.extend(
+                (attempt_id, question_id, option, option == correct)
+                for question_id, (option, correct, _) in changed.items()
+            )
+            if changed:
+                deltas[attempt_id] = counter_delta(before, changed)
+        upsert_answer_rows(upserts)
+        apply_counter_deltas(deltas)
+
+        for attempt_id, answers in sheets.items():
+            store_answers(
+                attempt_id,
+                [(question_id, *answer) for question_id, answer in answers.items()],
+                attempts[attempt_id].question_order,
+            )
+
+
+def flush_attempt(attempt_id):
+    """Write every buffered answer of one attempt to the database."""
+    if not write_behind_enabled():
+        return
+    buffer = get_answer_buffer()
+    while buffer.drain(write_buffered, attempt_id=attempt_id):
+        pass
+
+
+def flush_buffer(batch_size=1000):
+    """Drain the whole buffer in batches; return how many entries were written."""
+    buffer = get_answer_buffer()
+    total = 0
+    while True:
+        drained = buffer.drain(write_buffered, limit=batch_size)
+        total += drained
+        if drained < batch_size:
+            return total
@@ -0,0 +1,300 @@
+"""
+Answer storage.
+
+Answers are kept either as one UserAnswer row per question or, for
+attempts started with ``ANSWER_STORAGE = "sheet"``, packed into a single
+AnswerSheet row holding 3 bits per question in ``attempt.question_order``.
+Every writer and reader goes through this module so both layouts behave
+the same to the views, serializers and exports.
+
+Each write also moves the attempt's running ``answered_count``,
+``correct_count`` and ``score`` by the change it makes, so submitting and
+grading never re-read the answers (``manage.py check_attempt_counters``
+verifies the counters against them). On PostgreSQL a row-storage save is
+two statements: the attempt lock, then one statement that reads the
+previous answers, upserts the changed ones and moves the counters.
+
+Sheet scores are computed on the whole packed integer at once: the sheet
+is XORed with a packed answer key and every zero 3-bit field is a correct
+answer, so scoring is a handful of big-int operations plus a popcount per
+distinct marks value.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .models import AnswerSheet, Question, TestAttempt, UserAnswer
+
+OPTIONS = "ABCD"
+BITS = 3
+FIELD = (1 << BITS) - 1
+
+
+def uses_answer_sheet_storage():
+    return getattr(settings, "ANSWER_STORAGE", "rows") == "sheet"
+
+
+def low_bits(count):
+    """Integer with the lowest bit of each of ``count`` 3-bit fields set."""
+    return int("001" * count, 2) if count else 0
+
+
+def packed_size(count):
+    return (count * BITS + 7) // 8
+
+
+def pack(codes):
+    """Pack a list of 0-4 option codes into bytes."""
+    value = 0
+    for position, code in enumerate(codes):
+        value |= code << (position * BITS)
+    return value.to_bytes(packed_size(len(codes)), "little")
+
+
+def unpack(packed, count):
+    """Inverse of ``pack``: list of ``count`` option codes."""
+    value = int.from_bytes(bytes(packed), "little")
+    return [(value >> (position * BITS)) & FIELD for position in range(count)]
+
+
+def option_code(option):
+    return OPTIONS.index(option) + 1
+
+
+def record_answer(attempt, question, selected_option):
+    """Save ``selected_option`` for ``question``; return whether it is correct."""
+    order = attempt.question_order if attempt.uses_answer_sheet else None
+    store_answers(
+        attempt.id,
+        [(question.id, selected_option, question.correct_option, question.marks)],
+        order,
+    )
+    return selected_option == question.correct_option
+
+
+def store_answers(attempt_id, answers, sheet_order=None):
+    """
+    Write ``[(question_id, selected_option, correct_option, marks), ...]``
+    and move the attempt's running counters by the difference.
+
+    Later entries for the same question win. ``sheet_order`` is the
+    attempt's question order when it uses an answer sheet, None for row
+    storage. Returns False, writing nothing, once the attempt is no longer
+    ongoing.
+    """
+    latest = {
+        question_id: (option, correct, marks)
+        for question_id, option, correct, marks in answers
+    }
+    if not latest:
+        return True
+
+    with transaction.atomic():
+        if sheet_order is None:
+            # Lock the attempt so concurrent saves see each other's answers
+            if not TestAttempt.objects.select_for_update().filter(
+                pk=attempt_id, status="ONGOING"
+            ).exists():
+                return False
+            if connection.vendor == "postgresql":
+                return write_answer_rows(attempt_id, latest)
+            previous = dict(
+                UserAnswer.objects.filter(attempt_id=attempt_id, question_id__in=latest)
+                .values_list("question_id", "selected_option")
+            )
+            changed = {
+                question_id: answer
+                for question_id, answer in latest.items()
+                if previous.get(question_id) != answer[0]
+            }
+            if not changed:
+                return True
+            upsert_answer_rows(
+                (attempt_id, question_id, option, option == correct)
+                for question_id, (option, correct, _) in changed.items()
+            )
+        else:
+            positions = {question_id: index for index, question_id in enumerate(sheet_order)}
+            # Row lock makes the read-modify-write of the packed bits atomic
+            sheet, _ = AnswerSheet.objects.select_for_update().get_or_create(attempt_id=attempt_id)
+            value = int.from_bytes(bytes(sheet.packed), "little")
+            previous = {}
+            for question_id in latest:
+                code = (value >> (positions[question_id] * BITS)) & FIELD
+                if code:
+                    previous[question_id] = OPTIONS[code - 1]
+            changed = latest
+            for question_id, (option, _, _) in latest.items():
+                shift = positions[question_id] * BITS
+                value = (value & ~(FIELD << shift)) | (option_code(option) << shift)
+            sheet.packed = value.to_bytes(packed_size(len(sheet_order)), "little")
+            sheet.save(update_fields=["packed", "updated_at"])
+
+        if not apply_counter_deltas({attempt_id: counter_delta(previous, changed)}):
+            transaction.set_rollback(True)
+            return False
+    return True
+
+
+def write_answer_rows(attempt_id, latest):
+    """
+    Upsert the changed answers of ``latest`` and add their counter delta to
+    the attempt in one PostgreSQL statement; call with the attempt locked,
+    so the statement snapshot holds every earlier save.
+    """
+    answer_table = UserAnswer._meta.db_table
+    attempt_table = TestAttempt._meta.db_table
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(latest))
+    params = [
+        value
+        for question_id, (option, correct, marks) in latest.items()
+        for value in (question_id, option, option == correct, marks)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH input (question_id, selected_option, is_correct, marks) AS (VALUES {values}),
+            changed AS (
+                SELECT input.*, previous.question_id IS NULL AS first,
+                       COALESCE(previous.is_correct, FALSE) AS was_correct
+                FROM input
+                LEFT JOIN {answer_table} previous
+                  ON previous.attempt_id = %s AND previous.question_id = input.question_id
+                WHERE previous.selected_option IS DISTINCT FROM input.selected_option
+            ),
+            saved AS (
+                INSERT INTO {answer_table} (attempt_id, question_id, selected_option, is_correct, answered_at)
+                SELECT %s, question_id, selected_option, is_correct, NOW() FROM changed
+                ON CONFLICT (attempt_id, question_id) DO UPDATE
+                SET selected_option = EXCLUDED.selected_option, is_correct = EXCLUDED.is_correct
+            )
+            UPDATE {attempt_table} SET
+                answered_count = answered_count + (SELECT COUNT(*) FILTER (WHERE first) FROM changed),
+                correct_count = correct_count
+                    + (SELECT COALESCE(SUM(is_correct::int - was_correct::int), 0) FROM changed),
+                score = score
+                    + (SELECT COALESCE(SUM((is_correct::int - was_correct::int) * marks), 0) FROM changed)
+            WHERE id = %s AND status = 'ONGOING'
+            """,
+            [*params, attempt_id, attempt_id, attempt_id],
+        )
+        return cursor.rowcount == 1
+
+
+def counter_delta(previous, latest):
+    """
+    (answered, correct, score) change of replacing the ``previous``
+    {question_id: selected_option} with ``latest``
+    {question_id: (selected_option, correct_option, marks)}.
+    """
+    answered = correct_count = score = 0
+    for question_id, (option, correct, marks) in latest.items():
+        before = previous.get(question_id)
+        if before is None:
+            answered += 1
+        change = (option == correct) - (before == correct)
+        correct_count += change
+        score += change * marks
+    return answered, correct_count, score
+
+
+def apply_counter_deltas(deltas):
+    """
+    Add ``{attempt_id: (answered, correct, score)}`` to the running counters
+    of the ongoing attempts with one conditional UPDATE; return how many
+    attempts were updated.
+    """
+    if not deltas:
+        return 0
+
+    def column(index, field):
+        values = {attempt_id: delta[index] for attempt_id, delta in deltas.items()}
+        if len(values) == 1:
+            return F(field) + next(iter(values.values()))
+        return F(field) + Case(
+            *(When(pk=attempt_id, then=Value(value)) for attempt_id, value in values.items()),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    return TestAttempt.objects.filter(pk__in=deltas, status="ONGOING").update(
+        answered_count=column(0, "answered_count"),
+        correct_count=column(1, "correct_count"),
+        score=column(2, "score"),
+    )
+
+
+def upsert_answer_rows(rows):
+    """Upsert ``[(attempt_id, question_id, selected_option, is_correct), ...]`` with one query."""
+    UserAnswer.objects.bulk_create(
+        [
+            UserAnswer(
+                attempt_id=attempt_id,
+                question_id=question_id,
+                selected_option=option,
+                is_correct=is_correct,
+            )
+            for attempt_id, question_id, option, is_correct in rows
+        ],
+        update_conflicts=True,
+        unique_fields=["attempt", "question"],
+        update_fields=["selected_option", "is_correct"],
+    )
+
+
+def load_answers(attempt):
+    """{question_id: selected_option} for every answered question of ``attempt``."""
+    if not attempt.uses_answer_sheet:
+        return dict(attempt.answers.values_list("question_id", "selected_option"))
+
+    packed = AnswerSheet.objects.filter(attempt_id=attempt.id).values_list("packed", flat=True).first()
+    if packed is None:
+        return {}
+    order = attempt.question_order
+    return {
+        question_id: OPTIONS[code - 1]
+        for question_id, code in zip(order, unpack(packed, len(order)))
+        if code
+    }
+
+
+def answer_key(question_ids):
+    """Packed correct options and per-marks position masks for ``question_ids``."""
+    questions = dict(
+        (qid, (correct, marks))
+        for qid, correct, marks in Question.objects.filter(id__in=question_ids)
+        .values_list("id", "correct_option", "marks")
+    )
+    key = 0
+    marks_masks = {}
+    for position, question_id in enumerate(question_ids):
+        if question_id not in questions:
+            continue
+        correct, marks = questions[question_id]
+        key |= option_code(correct) << (position * BITS)
+        marks_masks[marks] = marks_masks.get(marks, 0) | (1 << (position * BITS))
+    return key, marks_masks
+
+
+def score_sheet(packed, question_ids):
+    """Score a packed sheet against the questions it is aligned to."""
+    count = len(question_ids)
+    key, marks_masks = answer_key(question_ids)
+    diff = int.from_bytes(bytes(packed), "little") ^ key
+    # A field is correct when every one of its 3 bits matches the key
+    mismatched = (diff | (diff >> 1) | (diff >> 2)) & low_bits(count)
+    correct = low_bits(count) & ~mismatched
+    return sum(marks * (correct & mask).bit_count() for marks, mask in marks_masks.items())
+
+
+def score_attempt(attempt):
+    """Total marks of the correct answers saved for ``attempt``."""
+    if not attempt.uses_answer_sheet:
+        return attempt.answers.filter(is_correct=True).aggregate(
+            total=Sum("question__marks")
+        )["total"] or 0
+
+    packed = AnswerSheet.objects.filter(attempt_id=attempt.id).values_list("packed", flat=True).first()
+    if packed is None:
+        return 0
+    return score_sheet(packed, attempt.question_order)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TestsConfig(AppConfig):
     name = 'tests'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,134 @@
+"""
+Per-test attempt archive.
+
+Every attempt of a test is exported as its own CSV (the format of
+ExportAttemptCSVAPIView) inside one zip. Attempts are loaded in batches
+with a fixed number of bulk queries per batch: layouts, answers, answer
+sheets and any questions not seen yet. Their CSVs are rendered from plain
+data by a process pool, one chunk of attempts per task. The zip is written
+to a non-seekable stream, so entries are yielded to the client as soon
+as their chunk is done and memory only holds the chunks in flight.
+"""
+import io
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+
+from .attempt_data import bulk_question_orders, bulk_selections
+from .exports import RESULTS_HEADER, csv_chunks, detail_rows, question_entry, summary_row
+from .models import Question, TestAttempt
+
+LOAD_BATCH = 500
+RENDER_CHUNK = 50
+
+
+class ZipStream(io.RawIOBase):
+    """Write-only buffer the zip is written into and drained from."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def load_payloads(test_id):
+    """
+    Yield ``(attempt_id, summary, question_order, selected, questions)`` for
+    every attempt of a test; ``questions`` is the shared id -> entry cache.
+    """
+    attempts = TestAttempt.objects.filter(test_id=test_id).select_related("user", "test").order_by("id")
+    questions = {}
+    last_id = 0
+    while True:
+        batch = list(attempts.filter(id__gt=last_id)[:LOAD_BATCH])
+        if not batch:
+            return
+        last_id = batch[-1].id
+
+        orders = bulk_question_orders(batch)
+        selected = bulk_selections(batch, orders)
+
+        missing = {qid for order in orders.values() for qid in order} - questions.keys()
+        questions.update(
+            (question.id, question_entry(question))
+            for question in Question.objects.filter(id__in=missing)
+        )
+
+        for attempt in batch:
+            order = orders[attempt.id]
+            if attempt.max_score is None:
+                attempt.summarize(sum(questions[qid][3] for qid in set(order) if qid in questions))
+            yield attempt.id, summary_row(attempt), order, selected[attempt.id], questions
+
+
+def render_chunk(chunk):
+    """Render ``[(attempt_id, summary, order, selected, questions), ...]`` to zip entries."""
+    return [
+        (
+            f"attempt_{attempt_id}.csv",
+            "".join(csv_chunks(RESULTS_HEADER, detail_rows(summary, order, questions, selected))),
+        )
+        for attempt_id, summary, order, selected, questions in chunk
+    ]
+
+
+def payload_chunks(test_id):
+    chunk = []
+    for attempt_id, summary, order, selected, questions in load_payloads(test_id):
+        # Ship each task only the questions its attempts use
+        used = {qid: questions[qid] for qid in order if qid in questions}
+        chunk.append((attempt_id, summary, order, selected, used))
+        if len(chunk) == RENDER_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def archive_workers():
+    return getattr(settings, "ARCHIVE_WORKERS", None) or min(4, os.cpu_count() or 1)
+
+
+def stream_test_archive(test_id, workers=None):
+    """Yield the bytes of a zip holding one CSV per attempt of ``test_id``."""
+    workers = archive_workers() if workers is None else workers
+    stream = ZipStream()
+    archive = zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED)
+
+    def add(entries):
+        for name, text in entries:
+            archive.writestr(name, text)
+        return stream.drain()
+
+    if workers <= 1:
+        for chunk in payload_chunks(test_id):
+            yield add(render_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for chunk in payload_chunks(test_id):
+                pending.add(pool.submit(render_chunk, chunk))
+                # Bound the work in flight so memory stays flat
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield add(future.result())
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield add(future.result())
+
+    archive.close()
+    yield stream.drain()
@@ -0,0 +1,118 @@
+"""
+Attempt assembly.
+
+Builds a TestAttempt together with its AttemptCategory rows and their
+question_set through rows inside one transaction, using a fixed number of
+bulk inserts regardless of how many categories or questions the test has.
+
+With ``ATTEMPT_QUESTION_STORAGE = "seed"`` no through rows are written at
+all: the attempt keeps a seed and a pool snapshot and its questions are
+re-derived from them (see ``TestAttempt.question_layout``).
+"""
+import random
+
+from django.conf import settings
+from django.db import transaction
+
+from .answers import uses_answer_sheet_storage
+from .dashboard import invalidate_dashboards
+from .models import AttemptCategory, TestAttempt
+from .question_pool import current_snapshot, derive_layout, sample_question_ids
+
+SEED_BITS = 63
+
+
+def uses_seed_storage():
+    return getattr(settings, "ATTEMPT_QUESTION_STORAGE", "rows") == "seed"
+
+
+def category_configs(test):
+    """``[(category_id, number_of_questions), ...]`` of ``test`` in layout order."""
+    return list(
+        test.category_configs.order_by("id").values_list("category_id", "number_of_questions")
+    )
+
+
+def pick_questions(test, rng=random, configs=None):
+    """
+    Return ``[(category_id, [question_id, ...]), ...]`` for a new attempt;
+    pass ``configs`` from ``category_configs`` when picking several.
+    """
+    if configs is None:
+        configs = category_configs(test)
+    return [
+        (category_id, sample_question_ids(category_id, count, rng))
+        for category_id, count in configs
+    ]
+
+
+def assemble_attempt(user, test, rng=random):
+    """
+    Create an attempt of ``test`` for ``user``.
+
+    Questions come from a pre-generated paper when the test keeps a paper
+    pool, otherwise they are sampled on the spot.
+    """
+    if uses_seed_storage():
+        return assemble_seeded_attempt(user, test, rng)
+
+    with transaction.atomic():
+        attempt = TestAttempt.objects.create(
+            user=user, test=test, uses_answer_sheet=uses_answer_sheet_storage()
+        )
+
+        layout = None
+        if test.paper_pool_size:
+            from .papers import claim_paper
+            layout = claim_paper(attempt)
+        if layout is None:
+            layout = pick_questions(test, rng)
+
+        save_layout(attempt, layout)
+        invalidate_dashboards([user.id])
+
+    return attempt
+
+
+def assemble_seeded_attempt(user, test, rng=random):
+    """Create an attempt that stores only a seed and a pool snapshot."""
+    snapshot = current_snapshot(test)
+    seed = rng.getrandbits(SEED_BITS)
+
+    with transaction.atomic():
+        attempt = TestAttempt.objects.create(
+            user=user,
+            test=test,
+            question_seed=seed,
+            pool_snapshot=snapshot,
+            uses_answer_sheet=uses_answer_sheet_storage(),
+        )
+        AttemptCategory.objects.bulk_create(
+            AttemptCategory(attempt=attempt, category_id=category_id)
+            for category_id, _ in derive_layout(snapshot.candidates, seed)
+        )
+        invalidate_dashboards([user.id])
+
+    return attempt
+
+
+def save_layout(attempt, layout):
+    """Bulk insert the AttemptCategory and question_set rows for ``layout``."""
+    categories = AttemptCategory.objects.bulk_create(
+        AttemptCategory(attempt=attempt, category_id=category_id)
+        for category_id, _ in layout
+    )
+    if any(category.pk is None for category in categories):
+        # Backend cannot return ids from a bulk insert, read them back once
+        ids = dict(
+            AttemptCategory.objects.filter(attempt=attempt).values_list("category_id", "id")
+        )
+        for category in categories:
+            category.pk = ids[category.category_id]
+
+    through = AttemptCategory.question_set.through
+    through.objects.bulk_create(
+        through(attemptcategory_id=category.pk, question_id=question_id)
+        for category, (_, question_ids) in zip(categories, layout)
+        for question_id in question_ids
+    )
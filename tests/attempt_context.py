@@ -0,0 +1,84 @@
+"""
+Cached per-attempt context for the answer submission hot path.
+
+Everything SubmitAnswerAPIView needs to validate and grade a click (owner,
+deadline, status, the attempt's questions with their correct option and
+marks) is loaded once per attempt and kept in the Django cache, so a
+normal answer save only costs the answer write itself. Completing an
+attempt must call ``invalidate_attempt_context``.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Question, TestAttempt
+
+CONTEXT_KEY = "attempt_context:{}"
+# Keep the context a little past the deadline so late clicks still hit it
+GRACE_SECONDS = 300
+
+
+class AttemptContext:
+    def __init__(self, attempt_id, user_id, ends_at, status, questions, order, uses_answer_sheet):
+        self.attempt_id = attempt_id
+        self.user_id = user_id
+        self.ends_at = ends_at
+        self.status = status
+        # {question_id: (correct_option, marks)}
+        self.questions = questions
+        self.order = order
+        self.uses_answer_sheet = uses_answer_sheet
+
+    def is_time_over(self):
+        return timezone.now() >= self.ends_at
+
+    def time_left(self):
+        remaining = (self.ends_at - timezone.now()).total_seconds()
+        if self.status == "COMPLETED" or remaining <= 0:
+            return "00 min 00 sec"
+        minutes, seconds = divmod(int(remaining), 60)
+        return f"{minutes} min {seconds} sec"
+
+
+def build_attempt_context(attempt):
+    questions = {
+        qid: (correct, marks)
+        for qid, correct, marks in Question.objects.filter(
+            id__in=attempt.question_ids, is_active=True
+        ).values_list("id", "correct_option", "marks")
+    }
+    return AttemptContext(
+        attempt_id=attempt.id,
+        user_id=attempt.user_id,
+        ends_at=attempt.ends_at,
+        status=attempt.status,
+        questions=questions,
+        order=attempt.question_order if attempt.uses_answer_sheet else None,
+        uses_answer_sheet=attempt.uses_answer_sheet,
+    )
+
+
+def get_attempt_context(attempt_id):
+    """Return the cached context of an attempt, loading it on first use; None if missing."""
+    key = CONTEXT_KEY.format(attempt_id)
+    context = cache.get(key)
+    if context is not None:
+        return context
+
+    attempt = TestAttempt.objects.filter(id=attempt_id).first()
+    if attempt is None:
+        return None
+
+    context = build_attempt_context(attempt)
+    if context.status != "COMPLETED":
+        timeout = (context.ends_at - timezone.now()).total_seconds() + GRACE_SECONDS
+        if timeout > 0:
+            cache.set(key, context, timeout=timeout)
+    return context
+
+
+def invalidate_attempt_context(attempt_id):
+    cache.delete(CONTEXT_KEY.format(attempt_id))
+
+
+def invalidate_attempt_contexts(attempt_ids):
+    cache.delete_many([CONTEXT_KEY.format(attempt_id) for attempt_id in attempt_ids])
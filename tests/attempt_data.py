@@ -0,0 +1,59 @@
+"""
+Bulk loaders for many attempts at once.
+
+The TestAttempt accessors (``question_order``, ``selected_options``) cost a
+query or two per attempt. Exports and analytics that walk thousands of
+attempts use these instead: a fixed number of queries per batch, whatever
+the question or answer storage mode of each attempt.
+"""
+from .answers import OPTIONS, unpack
+from .models import AnswerSheet, AttemptCategory, UserAnswer
+
+
+def bulk_question_layouts(attempts):
+    """
+    {attempt_id: [(category_id, [question_id, ...]), ...]} as
+    ``TestAttempt.question_layout``; one query for row-stored attempts.
+    """
+    through = AttemptCategory.question_set.through
+    layouts = {attempt.id: {} for attempt in attempts}
+    for attempt_id, category_id, question_id in (
+        through.objects
+        .filter(attemptcategory__attempt_id__in=[a.id for a in attempts if a.question_seed is None])
+        .order_by("attemptcategory__attempt_id", "attemptcategory_id", "question_id")
+        .values_list("attemptcategory__attempt_id", "attemptcategory__category_id", "question_id")
+    ):
+        layouts[attempt_id].setdefault(category_id, []).append(question_id)
+    layouts = {attempt_id: list(layout.items()) for attempt_id, layout in layouts.items()}
+    # Seeded layouts are derived in memory from their (cached) snapshot
+    for attempt in attempts:
+        if attempt.question_seed is not None:
+            layouts[attempt.id] = attempt.question_layout
+    return layouts
+
+
+def bulk_question_orders(attempts):
+    """{attempt_id: [question_id, ...]} in layout order; one query for row-stored attempts."""
+    return {
+        attempt_id: [question_id for _, question_ids in layout for question_id in question_ids]
+        for attempt_id, layout in bulk_question_layouts(attempts).items()
+    }
+
+
+def bulk_selections(attempts, orders):
+    """{attempt_id: {question_id: option}}; one query for rows, one for answer sheets."""
+    selected = {attempt.id: {} for attempt in attempts}
+    for attempt_id, question_id, option in UserAnswer.objects.filter(
+        attempt_id__in=[a.id for a in attempts if not a.uses_answer_sheet]
+    ).values_list("attempt_id", "question_id", "selected_option"):
+        selected[attempt_id][question_id] = option
+    for attempt_id, packed in AnswerSheet.objects.filter(
+        attempt_id__in=[a.id for a in attempts if a.uses_answer_sheet]
+    ).values_list("attempt_id", "packed"):
+        order = orders[attempt_id]
+        selected[attempt_id] = {
+            question_id: OPTIONS[code - 1]
+            for question_id, code in zip(order, unpack(packed, len(order)))
+            if code
+        }
+    return selected
@@ -0,0 +1,64 @@
+"""
+Published-test catalogue cache.
+
+The list of published tests only changes when a Test is saved or deleted
+(publishing and unpublishing both save it), so the serialized list, its
+JSON encoding and the rendered dashboard cards are built once per
+catalogue version and kept in the Django cache. ``tests.signals`` bumps
+the version token after the saving transaction commits; every worker then
+rebuilds on its next read. The ETag is a hash of the JSON, so clients can
+revalidate ``/api/tests/`` without the server touching the database.
+"""
+import hashlib
+import json
+import uuid
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from .models import Test
+
+VERSION_KEY = "catalogue:version"
+CATALOGUE_KEY = "catalogue:{}"
+# Old versions are never read again, let them expire
+CATALOGUE_TIMEOUT = 24 * 60 * 60
+
+
+def get_catalogue_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # add() keeps the first token if another worker raced us here
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalogue():
+    """Invalidate the catalogue in every worker once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None))
+
+
+def build_catalogue():
+    from .serializers import CatalogueTestSerializer
+
+    tests = list(Test.objects.filter(status="PUBLISHED").order_by("id"))
+    data = CatalogueTestSerializer(tests, many=True).data
+    encoded = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return {
+        "tests": data,
+        "json": encoded,
+        "etag": '"{}"'.format(hashlib.sha1(encoded.encode()).hexdigest()),
+        "cards": render_to_string("dashboard/_test_cards.html", {"tests": tests}),
+    }
+
+
+def get_catalogue():
+    """``{"tests", "json", "etag", "cards"}`` of the current catalogue version."""
+    key = CATALOGUE_KEY.format(get_catalogue_version())
+    catalogue = cache.get(key)
+    if catalogue is None:
+        catalogue = build_catalogue()
+        cache.set(key, catalogue, timeout=CATALOGUE_TIMEOUT)
+    return catalogue
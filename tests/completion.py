@@ -0,0 +1,140 @@
+"""
+Completing attempts.
+
+An attempt is closed when the candidate submits it, lazily when an expired
+attempt is touched again, and in bulk by ``manage.py sweep_expired_attempts``.
+All of them go through this module: buffered answers are flushed first,
+the running score kept by tests/answers.py becomes the result, and the
+status change is one conditional UPDATE, so an attempt is only ever
+completed once and no row is re-saved in full. The same transaction
+merges the scores into the test's score distribution
+(tests/score_distribution.py). The summary columns
+(max_score, percentage, passed, time taken) are then filled, the result
+document is rendered and stored (tests/results.py) and the owners' cached
+dashboards are dropped (tests/dashboard.py).
+"""
+import time
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .answer_buffer import flush_attempt, flush_buffer, write_behind_enabled
+from .attempt_context import invalidate_attempt_contexts
+from .dashboard import invalidate_dashboards
+from .models import AttemptCategory, Question, TestAttempt
+from .results import store_results
+from .score_distribution import record_scores
+
+SUMMARY_FIELDS = ["max_score", "percentage", "passed", "time_taken_seconds"]
+RESULT_FIELDS = ["status", "completed_at", "history_at", "score", "answered_count", "correct_count", *SUMMARY_FIELDS]
+
+
+def complete_attempts(attempt_ids, completed_at=None):
+    """Complete the still ongoing attempts among ``attempt_ids``; return how many."""
+    attempt_ids = list(attempt_ids)
+    if not attempt_ids:
+        return 0
+
+    if len(attempt_ids) == 1:
+        flush_attempt(attempt_ids[0])
+    elif write_behind_enabled():
+        flush_buffer()
+
+    with transaction.atomic():
+        # Locking first tells which attempts this call completes
+        completing = dict(
+            TestAttempt.objects.select_for_update()
+            .filter(id__in=attempt_ids, status="ONGOING")
+            .values_list("id", "user_id")
+        )
+        completed_at = completed_at or timezone.now()
+        completed = TestAttempt.objects.filter(id__in=completing).update(
+            status="COMPLETED", completed_at=completed_at, history_at=completed_at
+        )
+        record_scores(completing)
+    invalidate_attempt_contexts(attempt_ids)
+    if completed:
+        summarize_attempts(attempt_ids)
+        store_results(attempt_ids)
+        invalidate_dashboards(completing.values())
+    return completed
+
+
+def max_scores(attempts):
+    """
+    {attempt_id: total marks of its questions} for ``attempts``, with one
+    query for row-stored ones and one for seeded ones.
+    """
+    through = AttemptCategory.question_set.through
+    totals = dict(
+        through.objects.filter(
+            attemptcategory__attempt_id__in=[a.id for a in attempts if a.question_seed is None]
+        )
+        .values("attemptcategory__attempt_id")
+        .annotate(total=Sum("question__marks"))
+        .values_list("attemptcategory__attempt_id", "total")
+    )
+    seeded = [attempt for attempt in attempts if attempt.question_seed is not None]
+    if seeded:
+        marks = dict(
+            Question.objects.filter(id__in={qid for a in seeded for qid in a.question_ids})
+            .values_list("id", "marks")
+        )
+        for attempt in seeded:
+            totals[attempt.id] = sum(marks.get(qid, 0) for qid in attempt.question_ids)
+    return totals
+
+
+def summarize_attempts(attempt_ids):
+    """Fill the result summary columns of the completed attempts among ``attempt_ids``."""
+    attempts = list(
+        TestAttempt.objects.filter(id__in=list(attempt_ids), status="COMPLETED")
+        .select_related("test")
+        .only(
+            "id", "score", "started_at", "completed_at", "question_seed", "pool_snapshot_id",
+            "test__total_marks", "test__passing_marks",
+        )
+    )
+    totals = max_scores(attempts)
+    for attempt in attempts:
+        attempt.summarize(totals.get(attempt.id, 0))
+    TestAttempt.objects.bulk_update(attempts, SUMMARY_FIELDS)
+    return len(attempts)
+
+
+def complete_attempt(attempt, completed_at=None):
+    """Complete one attempt and refresh the instance with its result."""
+    complete_attempts([attempt.id], completed_at)
+    attempt.refresh_from_db(fields=RESULT_FIELDS)
+    return attempt
+
+
+def expired_attempts(now=None):
+    """Ongoing attempts whose time is over (a range scan of the status/ends_at index)."""
+    return TestAttempt.objects.filter(status="ONGOING", ends_at__lte=now or timezone.now())
+
+
+def sweep_expired_attempts(batch_size=500, now=None):
+    """
+    Complete every expired attempt in batches of ``batch_size``.
+
+    Returns ``{"completed", "batches", "seconds"}`` for the sweep.
+    """
+    started = time.monotonic()
+    now = now or timezone.now()
+    expired = expired_attempts(now)
+    completed = batches = 0
+    last_id = 0
+    while True:
+        attempt_ids = list(
+            expired.filter(id__gt=last_id)
+            .order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not attempt_ids:
+            break
+        last_id = attempt_ids[-1]
+        # Abandoned attempts end at their deadline, not when they are swept
+        completed += complete_attempts(attempt_ids, completed_at=F("ends_at"))
+        batches += 1
+    return {"completed": completed, "batches": batches, "seconds": time.monotonic() - started}
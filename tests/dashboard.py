@@ -0,0 +1,93 @@
+"""
+Per-user dashboard summary.
+
+Everything the dashboard shows about a user's own attempts (counts, best
+and last score, the latest results and the ongoing attempts, with test
+names) is built with one aggregate query plus two short list queries and
+kept in the Django cache. Starting an attempt (tests/assembly.py) and
+completing one (tests/completion.py) drop the cached summary once their
+transaction commits; an ongoing attempt whose deadline passes while the
+summary is cached is completed on the next read, which rebuilds it.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import TestAttempt
+
+SUMMARY_KEY = "dashboard_summary:{}"
+SUMMARY_TIMEOUT = 600
+RECENT_ATTEMPTS = 3
+
+
+def build_dashboard_summary(user_id):
+    attempts = TestAttempt.objects.filter(user_id=user_id)
+    completed = Q(status="COMPLETED")
+    summary = attempts.aggregate(
+        total_attempts=Count("id"),
+        completed=Count("id", filter=completed),
+        passed=Count("id", filter=completed & Q(passed=True)),
+        best_score=Max("score", filter=completed),
+        best_percentage=Max("percentage", filter=completed),
+    )
+
+    summary["recent"] = [
+        {
+            "id": attempt_id,
+            "test_id": test_id,
+            "test_name": test_name,
+            "score": score,
+            "total_marks": total_marks,
+            "percentage": percentage,
+            "passed": passed if passed is not None else score >= passing_marks,
+            "completed_at": completed_at,
+        }
+        for attempt_id, test_id, test_name, score, total_marks, passing_marks, percentage, passed, completed_at
+        in attempts.filter(completed).order_by("-completed_at", "-id").values_list(
+            "id", "test_id", "test__name", "score", "test__total_marks", "test__passing_marks",
+            "percentage", "passed", "completed_at",
+        )[:RECENT_ATTEMPTS]
+    ]
+    last = summary["recent"][0] if summary["recent"] else None
+    summary["last_score"] = last["score"] if last else None
+    summary["last_percentage"] = last["percentage"] if last else None
+
+    summary["ongoing"] = [
+        {"id": attempt_id, "test_id": test_id, "test_name": test_name, "started_at": started_at, "ends_at": ends_at}
+        for attempt_id, test_id, test_name, started_at, ends_at in attempts.filter(status="ONGOING")
+        .order_by("-started_at").values_list("id", "test_id", "test__name", "started_at", "ends_at")
+    ]
+    return summary
+
+
+def get_dashboard_summary(user_id):
+    """The cached summary of ``user_id``, rebuilt when missing or an ongoing attempt expired."""
+    from .completion import complete_attempts
+
+    key = SUMMARY_KEY.format(user_id)
+    summary = cache.get(key)
+    now = timezone.now()
+    if summary is not None:
+        expired = [attempt["id"] for attempt in summary["ongoing"] if attempt["ends_at"] <= now]
+        if not expired:
+            return summary
+        complete_attempts(expired)
+    else:
+        # Close expired attempts first so they show up as completed
+        complete_attempts(
+            TestAttempt.objects.filter(
+                user_id=user_id, status="ONGOING", ends_at__lte=now
+            ).values_list("id", flat=True)
+        )
+
+    summary = build_dashboard_summary(user_id)
+    cache.set(key, summary, timeout=SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_dashboards(user_ids):
+    """Drop the cached summaries of ``user_ids`` once the current transaction commits."""
+    keys = [SUMMARY_KEY.format(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
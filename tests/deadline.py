@@ -0,0 +1,33 @@
+"""
+Signed attempt deadline tokens.
+
+Starting an attempt issues a token holding the attempt id, its user and
+its deadline, signed with SECRET_KEY. The timer heartbeat only verifies
+the signature, so candidates can poll it as often as they like without a
+database or session lookup. The token says nothing about whether the
+attempt was submitted; answer saves and submission still check that.
+"""
+import time
+
+from django.core import signing
+
+SALT = "tests.attempt-deadline"
+
+
+def issue_deadline_token(attempt):
+    return signing.dumps(
+        {"attempt": attempt.id, "user": attempt.user_id, "ends_at": attempt.ends_at.timestamp()},
+        salt=SALT,
+    )
+
+
+def read_deadline_token(token):
+    """The token's payload, or None when it is malformed or tampered with."""
+    try:
+        return signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        return None
+
+
+def seconds_left(deadline):
+    return max(0, int(deadline["ends_at"] - time.time()))
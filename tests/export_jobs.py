@@ -0,0 +1,193 @@
+"""
+Asynchronous export jobs.
+
+An admin submits an export and gets a job back straight away. The worker
+(``manage.py run_export_jobs --loop``) claims pending jobs one at a time
+and writes them gzip-compressed under EXPORT_ROOT in chunks, recording
+progress as it goes. The finished file is served with Range support.
+Submitting an export identical to a pending or running one returns that
+job instead of queueing another. A running job whose worker stopped
+reporting progress for EXPORT_JOB_TIMEOUT seconds is failed, so it no
+longer blocks identical exports.
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import tarfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .archive import load_payloads
+from .exports import RESULTS_HEADER, csv_chunks, detail_rows, result_rows, results_export_queryset
+from .filters import parse_int
+from .models import ExportJob, Test, TestAttempt
+
+PROGRESS_EVERY = 5000
+RESULT_PARAMS = ("test", "user", "result", "score_min", "score_max", "completed_from", "completed_to")
+INT_PARAMS = ("test", "user", "score_min", "score_max")
+
+
+def export_root():
+    return Path(settings.EXPORT_ROOT)
+
+
+def job_path(job):
+    return export_root() / job.file_name
+
+
+def fingerprint(kind, params):
+    return hashlib.sha256(json.dumps([kind, params], sort_keys=True).encode()).hexdigest()
+
+
+def validate_params(kind, params):
+    """
+    Return ``params`` normalized (known filters only, integers parsed) so
+    equal exports share a fingerprint; raise ValidationError when invalid.
+    """
+    if kind == "results":
+        results_export_queryset(params)
+        return {
+            param: parse_int(params[param]) if param in INT_PARAMS else params[param]
+            for param in RESULT_PARAMS
+            if params.get(param)
+        }
+    if kind == "test_bundle":
+        test_id = parse_int(params.get("test"))
+        if test_id is None:
+            raise ValidationError({"test": "Must be an integer."})
+        if not Test.objects.filter(id=test_id).exists():
+            raise ValidationError({"test": "Test not found."})
+        return {"test": test_id}
+    raise ValidationError({"kind": "Unknown export kind."})
+
+
+def fail_stale_jobs(jobs=None):
+    """Fail the running jobs among ``jobs`` (default all) whose worker went silent; return how many."""
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT)
+    silent = Q(progress_at__lt=cutoff) | Q(progress_at__isnull=True, started_at__lt=cutoff)
+    return (jobs if jobs is not None else ExportJob.objects.all()).filter(
+        silent, status="RUNNING"
+    ).update(status="FAILED", error="Abandoned by its worker.", finished_at=now)
+
+
+def submit_export(user, kind, params):
+    """Return ``(job, created)``; an identical active job is reused."""
+    params = validate_params(kind, params)
+    key = fingerprint(kind, params)
+    fail_stale_jobs(ExportJob.objects.filter(fingerprint=key))
+    active = ExportJob.objects.filter(fingerprint=key, status__in=["PENDING", "RUNNING"])
+
+    job = active.first()
+    if job is not None:
+        return job, False
+    try:
+        with transaction.atomic():
+            return ExportJob.objects.create(
+                kind=kind, params=params, fingerprint=key, created_by=user
+            ), True
+    except IntegrityError:
+        # Lost a race with an identical submission
+        return active.get(), False
+
+
+def claim_next_job():
+    """Mark the oldest pending job RUNNING and return it, or None."""
+    fail_stale_jobs()
+    for job_id in ExportJob.objects.filter(status="PENDING").order_by("created_at").values_list("id", flat=True)[:10]:
+        now = timezone.now()
+        claimed = ExportJob.objects.filter(id=job_id, status="PENDING").update(
+            status="RUNNING", started_at=now, progress_at=now
+        )
+        if claimed:
+            return ExportJob.objects.get(id=job_id)
+    return None
+
+
+def report_progress(job, rows_done):
+    ExportJob.objects.filter(id=job.id).update(rows_done=rows_done, progress_at=timezone.now())
+
+
+def run_job(job):
+    """Write the export of a claimed job; the job ends DONE or FAILED."""
+    suffix = ".csv.gz" if job.kind == "results" else ".tar.gz"
+    job.file_name = f"export_{job.id}_{job.kind}{suffix}"
+    path = job_path(job)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".part")
+
+    started = time.monotonic()
+    try:
+        if job.kind == "results":
+            rows = write_results(job, partial)
+        else:
+            rows = write_test_bundle(job, partial)
+        os.replace(partial, path)
+    except Exception as exc:
+        partial.unlink(missing_ok=True)
+        ExportJob.objects.filter(id=job.id).update(
+            status="FAILED", error=str(exc), finished_at=timezone.now()
+        )
+        raise
+
+    finished = ExportJob.objects.filter(id=job.id, status="RUNNING").update(
+        status="DONE",
+        rows_done=rows,
+        file_name=job.file_name,
+        file_size=path.stat().st_size,
+        finished_at=timezone.now(),
+    )
+    if not finished:
+        # Failed as abandoned meanwhile; an identical job may already be queued
+        path.unlink(missing_ok=True)
+    return rows, time.monotonic() - started
+
+
+def counted(job, rows):
+    """Pass ``rows`` through, reporting progress every PROGRESS_EVERY rows."""
+    count = 0
+    for count, row in enumerate(rows, 1):
+        if count % PROGRESS_EVERY == 0:
+            report_progress(job, count)
+        yield row
+    job.rows_done = count
+
+
+def write_results(job, path):
+    queryset = results_export_queryset(job.params)
+    ExportJob.objects.filter(id=job.id).update(rows_total=queryset.count())
+    with gzip.open(path, "wt", newline="", encoding="utf-8") as out:
+        for chunk in csv_chunks(RESULTS_HEADER, counted(job, result_rows(queryset))):
+            out.write(chunk)
+    return job.rows_done
+
+
+def write_test_bundle(job, path):
+    """
+    One CSV per attempt of the test, as ExportAttemptCSVAPIView renders it,
+    loaded in batches by ``archive.load_payloads``.
+    """
+    test_id = job.params["test"]
+    ExportJob.objects.filter(id=job.id).update(rows_total=TestAttempt.objects.filter(test_id=test_id).count())
+    done = 0
+    with tarfile.open(path, "w:gz") as bundle:
+        for attempt_id, summary, order, selected, questions in load_payloads(test_id):
+            data = "".join(csv_chunks(RESULTS_HEADER, detail_rows(summary, order, questions, selected))).encode()
+            info = tarfile.TarInfo(f"attempt_{attempt_id}.csv")
+            info.size = len(data)
+            info.mtime = int(time.time())
+            bundle.addfile(info, io.BytesIO(data))
+            done += 1
+            if done % 100 == 0:
+                report_progress(job, done)
+    return done
+
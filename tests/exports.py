@@ -0,0 +1,137 @@
+"""
+Results exports.
+
+Rows are read through a server-side cursor (``QuerySet.iterator``) as
+plain tuples and turned into CSV text a few hundred rows at a time, so
+memory stays flat however many attempts are exported. Completed attempts
+take max_score from their stored summary; ongoing ones from a question
+marks annotation, never from per-row queries.
+"""
+import csv
+import io
+
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .filters import filter_admin_results
+from .models import AttemptCategory, TestAttempt
+
+RESULTS_HEADER = [
+    "ID", "User", "Test", "Score", "Max Score", "Percentage",
+    "Status", "Passed", "Time Taken", "Started At", "Completed At",
+]
+CURSOR_CHUNK = 2000
+ROWS_PER_CHUNK = 500
+
+
+def results_export_queryset(params):
+    """Attempts matching the admin results filters in ``params``, as value tuples."""
+    through = AttemptCategory.question_set.through
+    question_marks = Subquery(
+        through.objects.filter(attemptcategory__attempt=OuterRef("pk"))
+        .values("attemptcategory__attempt")
+        .annotate(total=Sum("question__marks"))
+        .values("total")
+    )
+    queryset = TestAttempt.objects.annotate(marks_total=Coalesce("max_score", question_marks))
+    queryset = filter_admin_results(queryset, params)
+    return queryset.order_by("-started_at", "-id").values_list(
+        "id", "user__username", "test__name", "score", "marks_total", "percentage",
+        "status", "passed", "time_taken_seconds", "started_at", "completed_at",
+    )
+
+
+def result_rows(queryset):
+    for (attempt_id, username, test_name, score, max_score, percentage,
+         status, passed, seconds, started_at, completed_at) in queryset.iterator(chunk_size=CURSOR_CHUNK):
+        time_taken = ""
+        if seconds is not None:
+            minutes, seconds = divmod(seconds, 60)
+            time_taken = f"{minutes} min {seconds} sec"
+        yield [
+            attempt_id,
+            username,
+            test_name,
+            score,
+            "" if max_score is None else max_score,
+            "" if percentage is None else percentage,
+            status,
+            "" if passed is None else ("PASS" if passed else "FAIL"),
+            time_taken,
+            started_at,
+            completed_at,
+        ]
+
+
+def csv_chunks(header, rows, rows_per_chunk=ROWS_PER_CHUNK):
+    """CSV text of ``header`` and ``rows``, yielded ``rows_per_chunk`` rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+ATTEMPT_DETAIL_HEADER = [
+    "Question ID", "Question Text", "Selected Option", "Selected Value",
+    "Correct Option", "Correct Value", "Is Correct", "Marks",
+]
+
+
+def question_entry(question):
+    """Plain, picklable view of a question for the detail rows."""
+    options = {"A": question.option_a, "B": question.option_b, "C": question.option_c, "D": question.option_d}
+    return question.question_text, options, question.correct_option, question.marks
+
+
+def summary_row(attempt):
+    """The attempt's row under RESULTS_HEADER (summary columns must be filled)."""
+    return [
+        attempt.id, attempt.user.username, attempt.test.name, attempt.score,
+        attempt.max_score, attempt.percentage, attempt.status,
+        "PASS" if attempt.passed else "FAIL", attempt.time_taken() or "",
+        attempt.started_at, attempt.completed_at,
+    ]
+
+
+def detail_rows(summary, question_order, questions, selected):
+    """
+    Rows of a single attempt's export following RESULTS_HEADER: its summary,
+    then one row per question in ``question_order``. ``questions`` maps ids
+    to ``question_entry`` tuples and ``selected`` ids to chosen options.
+    """
+    yield summary
+
+    # Per-question details
+    yield []
+    yield ATTEMPT_DETAIL_HEADER
+    seen = set()
+    for question_id in question_order:
+        if question_id in seen or question_id not in questions:
+            continue
+        seen.add(question_id)
+        text, options, correct, marks = questions[question_id]
+        chosen = selected.get(question_id, "")
+        yield [
+            question_id, text,
+            chosen, options.get(chosen, ""),
+            correct, options[correct],
+            "TRUE" if chosen == correct else "FALSE", marks,
+        ]
+
+
+def attempt_rows(attempt):
+    """Export rows of one attempt, loaded through its own accessors."""
+    if attempt.max_score is None:
+        attempt.summarize()
+    questions = {
+        question.id: question_entry(question)
+        for category_questions in attempt.questions_by_category.values()
+        for question in category_questions
+    }
+    return detail_rows(summary_row(attempt), attempt.question_order, questions, attempt.selected_options)
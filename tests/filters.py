@@ -0,0 +1,75 @@
+"""
+Admin results filters, shared by the results list and the exports.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def filter_admin_results(queryset, params):
+    """
+    Apply the admin results filters in SQL:
+    ``test``, ``user``, ``result`` (pass / fail), ``score_min`` / ``score_max``
+    and ``completed_from`` / ``completed_to`` (ISO date or datetime).
+    Raises ValidationError for malformed values.
+    """
+    errors = {}
+
+    for param, field in (("test", "test_id"), ("user", "user_id")):
+        if params.get(param):
+            value = parse_int(params[param])
+            if value is None:
+                errors[param] = "Must be an integer."
+            else:
+                queryset = queryset.filter(**{field: value})
+
+    result = params.get("result")  # pass / fail
+    if result == "pass":
+        queryset = queryset.filter(passed=True)
+    elif result == "fail":
+        queryset = queryset.filter(passed=False)
+
+    for param, lookup in (("score_min", "score__gte"), ("score_max", "score__lte")):
+        if params.get(param):
+            value = parse_int(params[param])
+            if value is None:
+                errors[param] = "Must be an integer."
+            else:
+                queryset = queryset.filter(**{lookup: value})
+
+    for param, lookup in (("completed_from", "completed_at__gte"), ("completed_to", "completed_at__lt")):
+        if params.get(param):
+            value = parse_moment(params[param], end_of_day=param == "completed_to")
+            if value is None:
+                errors[param] = "Must be an ISO date or datetime."
+            else:
+                queryset = queryset.filter(**{lookup: value})
+
+    if errors:
+        raise ValidationError(errors)
+    return queryset
+
+
+def parse_moment(value, end_of_day=False):
+    """Aware datetime from an ISO datetime or date; a date ending a range covers the whole day."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    except (TypeError, ValueError):
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -3,9 +3,15 @@ import json
 from django.urls import reverse
 from django.contrib import messages
 from django.utils import timezone
-from django.contrib.auth import get_user_model
-from .models import TestAttempt, Test
+from accounts.session_user import get_session_user
+from .models import TestAttempt
 from .serializers import TestResultSerializer, StartTestSerializer
+from .answer_buffer import flush_attempt
+from .completion import complete_attempt
+from .catalogue import get_catalogue
+from .dashboard import get_dashboard_summary
+from .deadline import issue_deadline_token
+from .results import get_result_document
 
 
 def start_attempt_view(request, test_id):
@@ -14,8 +20,7 @@ def start_attempt_view(request, test_id):
     if not user_id:
         return redirect("login_page")
 
-    User = get_user_model()
-    user = User.objects.filter(id=user_id).first()
+    user = get_session_user(request)
     if not user:
         return redirect("login_page")
 
@@ -33,9 +38,7 @@ def start_attempt_view(request, test_id):
             return redirect(reverse('test-attempt', args=[ongoing_attempt.id]))
         else:
             # Time is over, mark as completed
-            ongoing_attempt.status = "COMPLETED"
-            ongoing_attempt.completed_at = timezone.now()
-            ongoing_attempt.save()
+            complete_attempt(ongoing_attempt, completed_at=ongoing_attempt.ends_at)
 
     # Create new attempt
     serializer = StartTestSerializer(data={"test_id": test_id}, context={"request": request})
@@ -54,35 +57,25 @@ def dashboard_view(request):
     if not user_id:
         return redirect("login_page")
 
-    # Try to resolve the actual User instance from session
-    User = get_user_model()
-    current_user = User.objects.filter(id=user_id).first()
+    # Shared with the middleware and the context processor
+    current_user = get_session_user(request)
     if not current_user:
         return redirect("login_page")
 
-    tests = Test.objects.filter(status="PUBLISHED")
-    completed_attempts = TestAttempt.objects.filter(
-        user_id=user_id,
-        status="COMPLETED"
-    ).order_by('-completed_at', '-started_at')  # Latest first
-    attempt_count = completed_attempts.count()
-    
-    # Get ongoing attempts
-    ongoing_attempts = TestAttempt.objects.filter(
-        user_id=user_id,
-        status="ONGOING"
-    ).order_by('-started_at')
+    # Published tests and their rendered cards, cached per catalogue version
+    catalogue = get_catalogue()
+
+    # Counts, latest results and ongoing attempts, cached per user
+    summary = get_dashboard_summary(user_id)
 
     # optional highlight attempt id from querystring
     highlight_attempt = request.GET.get('highlight')
 
     return render(request, "dashboard/dashboard.html", {
-        "tests": tests,
-        "completed_attempts": completed_attempts,
-        "ongoing_attempts": ongoing_attempts,
+        "catalogue": catalogue,
+        "summary": summary,
         "current_user": current_user,
         "highlight_attempt": highlight_attempt,
-        "attempt_count": attempt_count,
     })
 
 
@@ -97,13 +90,12 @@ def test_attempt_view(request, attempt_id, index=None):
 
     attempt = get_object_or_404(TestAttempt, id=attempt_id, user_id=user_id)
 
+    # show answers still waiting in the write-behind buffer
+    flush_attempt(attempt.id)
     serializer = TestResultSerializer(attempt)
 
     # calculate remaining seconds for client timer
-    started = attempt.started_at
-    duration_seconds = attempt.test.duration * 60
-    elapsed = (timezone.now() - started).total_seconds()
-    remaining = int(max(0, duration_seconds - elapsed))
+    remaining = int(max(0, (attempt.ends_at - timezone.now()).total_seconds()))
 
     import json
     categories_data = serializer.data["categories"]
@@ -119,6 +111,7 @@ def test_attempt_view(request, attempt_id, index=None):
         "categories": categories_data,
         "categories_json": json.dumps(categories_data),
         "remaining_seconds": remaining,
+        "deadline_token": issue_deadline_token(attempt),
         "total_questions": total_questions,
     })
 
@@ -132,19 +125,13 @@ def test_result_view(request, attempt_id):
     if not user_id:
         return redirect("login_page")
 
-    try:
-        attempt = TestAttempt.objects.get(
-            id=attempt_id,
-            user_id=user_id
-        )
-    except TestAttempt.DoesNotExist:
+    result_json = get_result_document(attempt_id, user_id)
+    if result_json is None:
         messages.error(request, "Test attempt not found.")
         return redirect("dashboard")
 
-    serializer = TestResultSerializer(attempt)
-    result_data = serializer.data
     return render(request, "test/result.html", {
-        "result": result_data,
-        "result_json": json.dumps(result_data),
-        "attempt_id": attempt.id,
+        "result": json.loads(result_json),
+        "result_json": result_json,
+        "attempt_id": attempt_id,
     })
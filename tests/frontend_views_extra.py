@@ -1,8 +1,11 @@
+from django.http import Http404
 from django.shortcuts import render, redirect
-from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import F, Case, When
-from .models import TestAttempt
+from rest_framework.exceptions import NotFound
+
+from accounts.session_user import get_session_user
+
+from .history import attempt_history
+from .pagination import AttemptHistoryPagination
 
 
 def attempted_tests_view(request):
@@ -10,18 +13,19 @@ def attempted_tests_view(request):
     if not user_id:
         return redirect('login_page')
 
-    User = get_user_model()
-    user = User.objects.filter(id=user_id).first()
+    user = get_session_user(request)
     if not user:
         return redirect('login_page')
 
-    # Sort: completed attempts by completed_at (latest first), ongoing by started_at (latest first)
-    attempts = TestAttempt.objects.filter(user_id=user_id).annotate(
-        sort_date=Case(
-            When(status='COMPLETED', then=F('completed_at')),
-            default=F('started_at'),
-            output_field=models.DateTimeField()
-        )
-    ).order_by('-sort_date', '-started_at')
-    
-    return render(request, 'dashboard/attempted_tests.html', {'attempts': attempts})
+    # Latest first, one keyset page at a time
+    paginator = AttemptHistoryPagination()
+    try:
+        attempts = paginator.paginate_queryset(attempt_history(user_id), request)
+    except NotFound:
+        raise Http404("Invalid cursor")
+
+    return render(request, 'dashboard/attempted_tests.html', {
+        'attempts': attempts,
+        'next_url': paginator.get_next_link(),
+        'is_first_page': not request.GET.get(paginator.cursor_query_param),
+    })
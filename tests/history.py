@@ -0,0 +1,21 @@
+"""
+Attempt history.
+
+A user's attempts are listed latest first by ``TestAttempt.history_at``
+(the start of an ongoing attempt, the completion of a completed one),
+which is stored so the (user, -history_at, -id) index serves every page
+of the history page and API as a keyset range scan. Summary fields come
+from the stored result columns, never from the answers.
+"""
+from .models import TestAttempt
+
+HISTORY_FIELDS = (
+    "id", "test_id", "status", "score", "max_score", "percentage", "passed",
+    "time_taken_seconds", "started_at", "completed_at", "history_at",
+    "test__name", "test__total_marks",
+)
+
+
+def attempt_history(user_id):
+    """Attempts of ``user_id`` with their test, ready for AttemptHistoryPagination."""
+    return TestAttempt.objects.filter(user_id=user_id).select_related("test").only(*HISTORY_FIELDS)
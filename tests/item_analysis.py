@@ -0,0 +1,179 @@
+"""
+Item analysis.
+
+Classical statistics of every question of a test, computed from its
+completed attempts in batches. Each batch is loaded into a NumPy response
+matrix, one row per attempt and one column per question, holding
+
+    -1  question not presented to the attempt
+     0  presented, left blank
+   1-4  selected option A-D
+
+and every statistic is a column reduction over it. Only additive sums are
+stored in ItemStatistics, so a run merges the attempts completed since
+the previous one (``TestAttempt.item_analyzed``) without reading the old
+ones again; p-value and point-biserial are derived from the sums:
+
+    p  = correct / presented
+    r  = (n Sxy - Sx Sy) / sqrt((n Sxx - Sx^2) (n Sy - Sy^2))
+
+where x is the rest score (attempt score without the item) and y whether
+the item was answered correctly, over the n attempts it was presented to.
+"""
+import math
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .answers import OPTIONS
+from .attempt_data import bulk_question_orders, bulk_selections
+from .models import ItemStatistics, Question, Test, TestAttempt
+
+BATCH_SIZE = 2000
+NOT_PRESENTED = -1
+BLANK = 0
+SUMS = (
+    "presented", "correct", "blank", "chose_a", "chose_b", "chose_c", "chose_d",
+    "sum_rest", "sum_rest_sq", "sum_rest_correct",
+)
+
+
+def pending_attempts(test_id):
+    return TestAttempt.objects.filter(
+        test_id=test_id, status="COMPLETED", item_analyzed=False
+    ).order_by("id")
+
+
+def response_matrix(attempts):
+    """
+    ``(matrix, question_ids)`` for ``attempts``: an int8 array of shape
+    (attempts, questions) coded as described in the module docstring.
+    """
+    orders = bulk_question_orders(attempts)
+    selected = bulk_selections(attempts, orders)
+    question_ids = sorted({qid for order in orders.values() for qid in order})
+    column = {qid: index for index, qid in enumerate(question_ids)}
+
+    matrix = np.full((len(attempts), len(question_ids)), NOT_PRESENTED, dtype=np.int8)
+    presented = [(row, column[qid]) for row, a in enumerate(attempts) for qid in orders[a.id]]
+    answered = [
+        (row, column[qid], OPTIONS.index(option) + 1)
+        for row, a in enumerate(attempts)
+        for qid, option in selected[a.id].items()
+        if qid in column
+    ]
+    if presented:
+        rows, cols = zip(*presented)
+        matrix[rows, cols] = BLANK
+    if answered:
+        rows, cols, codes = zip(*answered)
+        matrix[rows, cols] = codes
+    return matrix, question_ids
+
+
+def column_sums(matrix, key, marks):
+    """
+    {field: array over questions} of the ItemStatistics sums of one matrix.
+    ``key`` holds the correct option code and ``marks`` the marks of each column.
+    """
+    presented = matrix != NOT_PRESENTED
+    correct = matrix == key
+    score = correct @ marks
+    # Rest score of every (attempt, question) cell, zero where not presented
+    rest = (score[:, None] - correct * marks) * presented
+    sums = {
+        "presented": presented.sum(axis=0),
+        "correct": correct.sum(axis=0),
+        "blank": (matrix == BLANK).sum(axis=0),
+        "sum_rest": rest.sum(axis=0),
+        "sum_rest_sq": (rest * rest).sum(axis=0),
+        "sum_rest_correct": (rest * correct).sum(axis=0),
+    }
+    for code, option in enumerate(OPTIONS, start=1):
+        sums[f"chose_{option.lower()}"] = (matrix == code).sum(axis=0)
+    return sums
+
+
+def derive(stats):
+    """Set p_value and point_biserial of ``stats`` from its sums."""
+    n, sy = stats.presented, stats.correct
+    stats.p_value = sy / n if n else None
+    variance = (n * stats.sum_rest_sq - stats.sum_rest ** 2) * (n * sy - sy * sy)
+    # Undefined when everyone got the item right (or wrong) or scored the same
+    stats.point_biserial = (
+        (n * stats.sum_rest_correct - stats.sum_rest * sy) / math.sqrt(variance)
+        if variance > 0 else None
+    )
+
+
+def analyze_batch(test_id, attempts):
+    """Merge the statistics of ``attempts`` into the test's ItemStatistics."""
+    with transaction.atomic():
+        # One analysis per test at a time, the merge is a read-modify-write.
+        # Attempts merged by an overlapping run while we waited are dropped.
+        Test.objects.select_for_update().filter(pk=test_id).exists()
+        pending = set(
+            pending_attempts(test_id).filter(id__in=[a.id for a in attempts]).values_list("id", flat=True)
+        )
+        attempts = [a for a in attempts if a.id in pending]
+        if not attempts:
+            return 0
+
+        matrix, question_ids = response_matrix(attempts)
+        keys = {
+            qid: (OPTIONS.index(correct) + 1, marks)
+            for qid, correct, marks in Question.objects.filter(id__in=question_ids)
+            .values_list("id", "correct_option", "marks")
+        }
+        # Columns of deleted questions cannot be scored
+        keep = [index for index, qid in enumerate(question_ids) if qid in keys]
+        question_ids = [question_ids[index] for index in keep]
+        matrix = matrix[:, keep]
+        key = np.array([keys[qid][0] for qid in question_ids], dtype=np.int8)
+        marks = np.array([keys[qid][1] for qid in question_ids], dtype=np.float64)
+        sums = column_sums(matrix, key, marks)
+
+        existing = {
+            stats.question_id: stats
+            for stats in ItemStatistics.objects.filter(test_id=test_id, question_id__in=question_ids)
+        }
+        now = timezone.now()
+        created = []
+        for index, qid in enumerate(question_ids):
+            stats = existing.get(qid)
+            if stats is None:
+                stats = ItemStatistics(test_id=test_id, question_id=qid)
+                created.append(stats)
+            for field in SUMS:
+                value = sums[field][index].item()
+                setattr(stats, field, getattr(stats, field) + value)
+            derive(stats)
+            stats.updated_at = now
+        ItemStatistics.objects.bulk_create(created)
+        ItemStatistics.objects.bulk_update(
+            list(existing.values()), [*SUMS, "p_value", "point_biserial", "updated_at"]
+        )
+        TestAttempt.objects.filter(id__in=pending).update(item_analyzed=True)
+    return len(attempts)
+
+
+def analyze_test(test_id, full=False, batch_size=BATCH_SIZE):
+    """
+    Bring the item statistics of a test up to date; return how many
+    attempts were merged. ``full`` drops the statistics and starts over.
+    """
+    if full:
+        with transaction.atomic():
+            ItemStatistics.objects.filter(test_id=test_id).delete()
+            TestAttempt.objects.filter(test_id=test_id, item_analyzed=True).update(item_analyzed=False)
+
+    attempts = pending_attempts(test_id).only(
+        "id", "question_seed", "pool_snapshot_id", "uses_answer_sheet"
+    )
+    analyzed = 0
+    while True:
+        batch = list(attempts[:batch_size])
+        if not batch:
+            return analyzed
+        analyzed += analyze_batch(test_id, batch)
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tests.item_analysis import BATCH_SIZE, analyze_test
+from tests.models import Test, TestAttempt
+
+
+class Command(BaseCommand):
+    help = "Merge newly completed attempts into the per-question item statistics"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, help="Only analyze this test id")
+        parser.add_argument('--full', action='store_true', help="Drop the statistics and recompute them")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['test']:
+            if not Test.objects.filter(id=options['test']).exists():
+                raise CommandError(f"Test {options['test']} does not exist")
+            test_ids = [options['test']]
+        elif options['full']:
+            test_ids = list(Test.objects.order_by("id").values_list("id", flat=True))
+        else:
+            test_ids = list(
+                TestAttempt.objects.filter(status="COMPLETED", item_analyzed=False)
+                .order_by("test_id").values_list("test_id", flat=True).distinct()
+            )
+
+        total = 0
+        for test_id in test_ids:
+            started = time.monotonic()
+            analyzed = analyze_test(test_id, full=options['full'], batch_size=options['batch_size'])
+            total += analyzed
+            if analyzed:
+                self.stdout.write(f"Test {test_id}: {analyzed} attempts in {time.monotonic() - started:.2f}s")
+        self.stdout.write(self.style.SUCCESS(f"Done, {total} attempts analyzed"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from tests.completion import summarize_attempts
+from tests.models import AttemptResult, TestAttempt
+
+
+class Command(BaseCommand):
+    help = "Fill max_score, percentage, passed and time_taken_seconds of completed attempts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help="Recompute attempts that already have a summary")
+
+    def handle(self, *args, **options):
+        attempts = TestAttempt.objects.filter(status="COMPLETED").order_by("id")
+        if not options['all']:
+            attempts = attempts.filter(max_score__isnull=True)
+
+        filled = 0
+        last_id = 0
+        while True:
+            batch = list(attempts.filter(id__gt=last_id).values_list("id", flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1]
+            filled += summarize_attempts(batch)
+            if options['all']:
+                # Stored documents carry the old summary; they are re-rendered on first read
+                AttemptResult.objects.filter(attempt_id__in=batch).delete()
+            self.stdout.write(f"Summarized {filled} attempts")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {filled} attempts summarized"))
@@ -0,0 +1,97 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounts.models import User
+from tests.answers import OPTIONS, record_answer, score_attempt
+from tests.assembly import pick_questions, save_layout
+from tests.models import AnswerSheet, Question, QuestionCategory, Test, TestAttempt, TestCategoryConfig, UserAnswer
+from tests.question_pool import invalidate_category
+
+
+class Command(BaseCommand):
+    help = "Compare row-per-answer and packed answer sheet storage (all data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=50)
+        parser.add_argument('--questions', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            test = self.build_test(options['questions'])
+            user = User.objects.create_user(
+                username="answer-benchmark", email="answer-benchmark@example.com", password=None
+            )
+            for sheet in (False, True):
+                self.run(test, user, sheet, options['attempts'], rng)
+            transaction.set_rollback(True)
+
+    def build_test(self, count):
+        category = QuestionCategory.objects.create(name="answer-benchmark")
+        Question.objects.bulk_create(
+            Question(
+                question_category=category,
+                question_text=f"Benchmark question {number}",
+                option_a="a", option_b="b", option_c="c", option_d="d",
+                correct_option=OPTIONS[number % 4],
+                marks=1 + number % 3,
+            )
+            for number in range(count)
+        )
+        invalidate_category(category.id)
+        test = Test.objects.create(
+            name="answer-benchmark", duration=60, max_questions=count,
+            total_marks=count, passing_marks=1, status="PUBLISHED",
+        )
+        TestCategoryConfig.objects.create(test=test, category=category, number_of_questions=count)
+        return test
+
+    def run(self, test, user, sheet, count, rng):
+        attempts = []
+        for _ in range(count):
+            attempt = TestAttempt.objects.create(user=user, test=test, uses_answer_sheet=sheet)
+            save_layout(attempt, pick_questions(test, rng))
+            attempts.append(attempt)
+        questions = Question.objects.in_bulk(attempts[0].question_ids)
+
+        started = time.perf_counter()
+        answers = 0
+        for attempt in attempts:
+            for question_id in attempt.question_order:
+                record_answer(attempt, questions[question_id], rng.choice(OPTIONS))
+                answers += 1
+        submit_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for attempt in attempts:
+            score_attempt(attempt)
+        score_seconds = time.perf_counter() - started
+
+        ids = [attempt.id for attempt in attempts]
+        if sheet:
+            rows = AnswerSheet.objects.filter(attempt_id__in=ids).count()
+            size = self.storage_bytes("tests_answersheet", "attempt_id", ids)
+        else:
+            rows = UserAnswer.objects.filter(attempt_id__in=ids).count()
+            size = self.storage_bytes("tests_useranswer", "attempt_id", ids)
+
+        self.stdout.write(
+            f"{'sheet' if sheet else 'rows'}: {rows} rows, {size} bytes, "
+            f"submit {submit_seconds / answers * 1000:.3f} ms/answer, "
+            f"score {score_seconds / count * 1000:.3f} ms/attempt"
+        )
+
+    def storage_bytes(self, table, column, ids):
+        """Tuple bytes of the benchmark rows (PostgreSQL only)."""
+        if connection.vendor != "postgresql":
+            return "n/a"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {table} t WHERE {column} = ANY(%s)",
+                [ids],
+            )
+            return cursor.fetchone()[0]
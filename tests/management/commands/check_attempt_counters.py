@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+
+from tests.answers import load_answers
+from tests.models import Question, TestAttempt, UserAnswer
+
+COUNTERS = ("answered_count", "correct_count", "score")
+
+
+class Command(BaseCommand):
+    help = "Verify the running answer counters of attempts against their saved answers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--test', type=int, help="Only check attempts of this test id")
+        parser.add_argument('--fix', action='store_true', help="Rewrite counters that do not match")
+
+    def handle(self, *args, **options):
+        attempts = TestAttempt.objects.order_by("id")
+        if options['test']:
+            attempts = attempts.filter(test_id=options['test'])
+
+        checked = mismatched = 0
+        last_id = 0
+        while True:
+            batch = list(attempts.filter(id__gt=last_id).only(
+                "id", "status", "uses_answer_sheet", "question_seed", "pool_snapshot_id", *COUNTERS
+            )[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            expected = self.expected_counters(batch)
+            wrong = []
+            for attempt in batch:
+                counters = expected.get(attempt.id, (0, 0, 0))
+                current = tuple(getattr(attempt, field) for field in COUNTERS)
+                if current == counters:
+                    continue
+                self.stdout.write(
+                    f"Attempt {attempt.id}: answered/correct/score {current} != {counters}"
+                )
+                for field, value in zip(COUNTERS, counters):
+                    setattr(attempt, field, value)
+                wrong.append(attempt)
+
+            if options['fix'] and wrong:
+                TestAttempt.objects.bulk_update(wrong, COUNTERS)
+            checked += len(batch)
+            mismatched += len(wrong)
+
+        summary = f"Checked {checked} attempts, {mismatched} with wrong counters"
+        if options['fix']:
+            summary += " (fixed)"
+        self.stdout.write(self.style.SUCCESS(summary) if not mismatched else self.style.WARNING(summary))
+
+    def expected_counters(self, batch):
+        """{attempt_id: (answered, correct, score)} recomputed from the raw answers."""
+        rows = [attempt.id for attempt in batch if not attempt.uses_answer_sheet]
+        expected = {
+            attempt_id: (answered, correct, score or 0)
+            for attempt_id, answered, correct, score in UserAnswer.objects
+            .filter(attempt_id__in=rows)
+            .values("attempt_id")
+            .annotate(
+                answered=Count("id"),
+                correct=Count("id", filter=Q(is_correct=True)),
+                score=Sum("question__marks", filter=Q(is_correct=True)),
+            )
+            .values_list("attempt_id", "answered", "correct", "score")
+        }
+
+        sheets = {attempt.id: load_answers(attempt) for attempt in batch if attempt.uses_answer_sheet}
+        keys = dict(
+            (qid, (correct, marks))
+            for qid, correct, marks in Question.objects.filter(
+                id__in={qid for selected in sheets.values() for qid in selected}
+            ).values_list("id", "correct_option", "marks")
+        )
+        for attempt_id, selected in sheets.items():
+            right = [qid for qid, option in selected.items() if qid in keys and keys[qid][0] == option]
+            expected[attempt_id] = (len(selected), len(right), sum(keys[qid][1] for qid in right))
+        return expected
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tests.models import AttemptCategory, TestAttempt
+from tests.question_pool import bulk_snapshot_ids, pool_fingerprint
+
+
+class Command(BaseCommand):
+    help = "Move row-stored attempt questions to seed storage and drop their question_set rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--test', type=int, help="Only convert attempts of this test id")
+
+    def handle(self, *args, **options):
+        through = AttemptCategory.question_set.through
+        attempts = TestAttempt.objects.filter(question_seed__isnull=True).order_by("id")
+        if options['test']:
+            attempts = attempts.filter(test_id=options['test'])
+
+        converted = 0
+        last_id = 0
+        while True:
+            batch = list(attempts.filter(id__gt=last_id).only("id", "test_id")[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            layouts = {attempt.id: {} for attempt in batch}
+            rows = (
+                through.objects
+                .filter(attemptcategory__attempt_id__in=layouts)
+                .order_by("attemptcategory_id", "question_id")
+                .values_list("attemptcategory__attempt_id", "attemptcategory__category_id", "question_id")
+            )
+            for attempt_id, category_id, question_id in rows:
+                layouts[attempt_id].setdefault(category_id, []).append(question_id)
+
+            # Asking for every candidate makes the derived selection the
+            # stored one, in the same order, for any seed
+            candidates = {
+                attempt.id: [
+                    [category_id, len(question_ids), question_ids]
+                    for category_id, question_ids in layouts[attempt.id].items()
+                ]
+                for attempt in batch
+            }
+            with transaction.atomic():
+                # Attempts with the same layout share one snapshot
+                snapshot_ids = bulk_snapshot_ids(
+                    (attempt.test_id, candidates[attempt.id]) for attempt in batch
+                )
+                for attempt in batch:
+                    key = (attempt.test_id, pool_fingerprint(candidates[attempt.id]))
+                    attempt.pool_snapshot_id = snapshot_ids[key]
+                    attempt.question_seed = 0
+                TestAttempt.objects.bulk_update(batch, ["question_seed", "pool_snapshot"])
+                through.objects.filter(attemptcategory__attempt_id__in=layouts).delete()
+
+            converted += len(batch)
+            self.stdout.write(f"Converted {converted} attempts")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {converted} attempts now use seed storage"))
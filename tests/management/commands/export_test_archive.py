@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tests.archive import stream_test_archive
+from tests.models import Test
+
+
+class Command(BaseCommand):
+    help = "Write a zip with one CSV per attempt of a test"
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_id', type=int)
+        parser.add_argument('--output', help="Zip file to write (default test_<id>_attempts.zip)")
+        parser.add_argument('--workers', type=int, help="Rendering processes (1 renders in this process)")
+
+    def handle(self, *args, **options):
+        test_id = options['test_id']
+        if not Test.objects.filter(id=test_id).exists():
+            raise CommandError(f"Test {test_id} does not exist")
+
+        output = options['output'] or f"test_{test_id}_attempts.zip"
+        started = time.monotonic()
+        size = 0
+        with open(output, "wb") as file:
+            for data in stream_test_archive(test_id, workers=options['workers']):
+                file.write(data)
+                size += len(data)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {output} ({size} bytes) in {time.monotonic() - started:.2f}s"
+        ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tests.answer_buffer import flush_buffer
+
+
+class Command(BaseCommand):
+    help = "Write buffered answers to the database in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help="Keep flushing in the background")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between flushes with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            written = flush_buffer(options['batch_size'])
+            if written or not options['loop']:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"Flushed {written} buffered answers in {elapsed:.2f}s")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tests.models import Test
+from tests.score_distribution import rebuild_distributions
+
+
+class Command(BaseCommand):
+    help = "Recount the score distribution of every test from its completed attempts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, help="Only rebuild this test id")
+        parser.add_argument('--batch-size', type=int, default=100, help="Tests recounted per transaction")
+
+    def handle(self, *args, **options):
+        tests = Test.objects.order_by("id")
+        if options['test']:
+            tests = tests.filter(id=options['test'])
+            if not tests.exists():
+                raise CommandError(f"Test {options['test']} does not exist")
+
+        rebuilt = 0
+        last_id = 0
+        while True:
+            test_ids = list(tests.filter(id__gt=last_id).values_list("id", flat=True)[:options['batch_size']])
+            if not test_ids:
+                break
+            last_id = test_ids[-1]
+            with transaction.atomic():
+                rebuilt += rebuild_distributions(test_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} score distributions"))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tests.models import Test
+from tests.papers import discard_papers, paper_pool_depth, refill_papers
+
+
+class Command(BaseCommand):
+    help = "Top up the pre-generated question paper pools of published tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, help="Only refill this test id")
+        parser.add_argument('--rebuild', action='store_true', help="Discard unclaimed papers first")
+        parser.add_argument('--loop', action='store_true', help="Keep refilling in the background")
+        parser.add_argument('--interval', type=int, default=30, help="Seconds between refills with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            self.refill(options)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def refill(self, options):
+        tests = Test.objects.filter(status="PUBLISHED", paper_pool_size__gt=0)
+        if options['test']:
+            tests = tests.filter(id=options['test'])
+
+        for test in tests:
+            if options['rebuild']:
+                discard_papers(test.id)
+            added = refill_papers(test)
+            depth = paper_pool_depth(test.id)
+            self.stdout.write(
+                f"{test.name}: added {added}, pool depth {depth}/{test.paper_pool_size}"
+            )
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tests.export_jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Write queued export jobs to disk, one at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep waiting for new jobs")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            try:
+                rows, seconds = run_job(job)
+            except Exception as exc:
+                self.stderr.write(f"Export #{job.id} failed: {exc}")
+                continue
+            rate = rows / seconds if seconds else 0
+            self.stdout.write(f"Export #{job.id} ({job.kind}): {rows} rows in {seconds:.2f}s ({rate:.0f} rows/s)")
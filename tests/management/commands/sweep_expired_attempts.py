@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tests.completion import sweep_expired_attempts
+
+
+class Command(BaseCommand):
+    help = "Complete ongoing attempts whose time is over, scoring them from their saved answers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help="Keep sweeping in the background")
+        parser.add_argument('--interval', type=float, default=60.0, help="Seconds between sweeps with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = sweep_expired_attempts(options['batch_size'])
+            if stats['completed'] or not options['loop']:
+                rate = stats['completed'] / stats['seconds'] if stats['seconds'] else 0
+                self.stdout.write(
+                    f"Completed {stats['completed']} expired attempts in {stats['batches']} batches, "
+                    f"{stats['seconds']:.2f}s ({rate:.0f} attempts/s)"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
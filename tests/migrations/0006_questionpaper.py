@@ -0,0 +1,32 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0005_alter_question_question_category_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='paper_pool_size',
+            field=models.PositiveIntegerField(default=0, help_text='Randomized papers kept pre-generated while published (0 disables)'),
+        ),
+        migrations.CreateModel(
+            name='QuestionPaper',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('layout', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attempt', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='paper', to='tests.testattempt')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='papers', to='tests.test')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['test', 'attempt'], name='tests_quest_test_id_a1a807_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0006_questionpaper'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='question_seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='QuestionPoolSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('candidates', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pool_snapshots', to='tests.test')),
+            ],
+            options={
+                'unique_together': {('test', 'fingerprint')},
+            },
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='pool_snapshot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='attempts', to='tests.questionpoolsnapshot'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0007_seeded_attempt_questions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerSheet',
+            fields=[
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='answer_sheet', serialize=False, to='tests.testattempt')),
+                ('packed', models.BinaryField(default=bytes)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='uses_answer_sheet',
+            field=models.BooleanField(default=False),
+        ),
+    ]
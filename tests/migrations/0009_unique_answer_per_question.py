@@ -0,0 +1,33 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:49
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_answers(apps, schema_editor):
+    # Keep only the latest answer when a question was answered more than once
+    UserAnswer = apps.get_model('tests', 'UserAnswer')
+    duplicates = (
+        UserAnswer.objects.values('attempt_id', 'question_id')
+        .annotate(rows=Count('id'), keep=Max('id'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates.iterator():
+        UserAnswer.objects.filter(
+            attempt_id=row['attempt_id'], question_id=row['question_id']
+        ).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0008_answersheet'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='useranswer',
+            constraint=models.UniqueConstraint(fields=('attempt', 'question'), name='unique_answer_per_question'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:55
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Fill the counters of row-stored attempts from their answers. Answer
+    sheet attempts are fixed with ``manage.py check_attempt_counters --fix``.
+    """
+    TestAttempt = apps.get_model("tests", "TestAttempt")
+    UserAnswer = apps.get_model("tests", "UserAnswer")
+
+    def per_attempt(aggregate):
+        return Coalesce(
+            Subquery(
+                UserAnswer.objects.filter(attempt=OuterRef("pk"))
+                .values("attempt")
+                .annotate(total=aggregate)
+                .values("total")
+            ),
+            0,
+        )
+
+    rows = TestAttempt.objects.filter(uses_answer_sheet=False)
+    rows.update(
+        answered_count=per_attempt(Count("id")),
+        correct_count=per_attempt(Count("id", filter=Q(is_correct=True))),
+    )
+    # Completed attempts keep the score they were graded with
+    rows.filter(status="ONGOING").update(
+        score=per_attempt(Sum("question__marks", filter=Q(is_correct=True)))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0009_unique_answer_per_question'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='correct_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
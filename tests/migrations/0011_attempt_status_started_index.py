@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0010_attempt_running_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(fields=['status', 'started_at'], name='tests_testa_status_d060a7_idx'),
+        ),
+    ]
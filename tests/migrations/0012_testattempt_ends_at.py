@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_ends_at(apps, schema_editor):
+    """ends_at = started_at + test.duration, one UPDATE per distinct duration."""
+    Test = apps.get_model("tests", "Test")
+    TestAttempt = apps.get_model("tests", "TestAttempt")
+    for duration in Test.objects.values_list("duration", flat=True).distinct():
+        TestAttempt.objects.filter(test__duration=duration).update(
+            ends_at=F("started_at") + timedelta(minutes=duration)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0011_attempt_status_started_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='ends_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_ends_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='testattempt',
+            name='ends_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.RemoveIndex(
+            model_name='testattempt',
+            name='tests_testa_status_d060a7_idx',
+        ),
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(fields=['status', 'ends_at'], name='tests_testa_status_e8f6a2_idx'),
+        ),
+    ]
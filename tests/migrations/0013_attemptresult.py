@@ -0,0 +1,22 @@
+# Generated by Django 4.2.27 on 2026-10-18 11:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0012_testattempt_ends_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptResult',
+            fields=[
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='result', serialize=False, to='tests.testattempt')),
+                ('document', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
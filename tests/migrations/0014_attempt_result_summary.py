@@ -0,0 +1,41 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0013_attemptresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='max_score',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='passed',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='percentage',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='time_taken_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(fields=['test', 'passed'], name='tests_testa_test_id_f07489_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(fields=['test', '-percentage'], name='tests_testa_test_id_d3560e_idx'),
+        ),
+    ]
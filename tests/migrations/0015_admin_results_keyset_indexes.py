@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0014_attempt_result_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(fields=['status', '-completed_at', '-id'], name='tests_testa_status_c8df23_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(fields=['test', 'status', '-completed_at', '-id'], name='tests_testa_test_id_ef7d8a_idx'),
+        ),
+    ]
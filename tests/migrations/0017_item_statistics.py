@@ -0,0 +1,56 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0016_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('presented', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('blank', models.PositiveIntegerField(default=0)),
+                ('chose_a', models.PositiveIntegerField(default=0)),
+                ('chose_b', models.PositiveIntegerField(default=0)),
+                ('chose_c', models.PositiveIntegerField(default=0)),
+                ('chose_d', models.PositiveIntegerField(default=0)),
+                ('sum_rest', models.FloatField(default=0)),
+                ('sum_rest_sq', models.FloatField(default=0)),
+                ('sum_rest_correct', models.FloatField(default=0)),
+                ('p_value', models.FloatField(blank=True, null=True)),
+                ('point_biserial', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='item_analyzed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(condition=models.Q(('item_analyzed', False), ('status', 'COMPLETED')), fields=['test', 'id'], name='attempt_pending_item_analysis'),
+        ),
+        migrations.AddField(
+            model_name='itemstatistics',
+            name='question',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_statistics', to='tests.question'),
+        ),
+        migrations.AddField(
+            model_name='itemstatistics',
+            name='test',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_statistics', to='tests.test'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='itemstatistics',
+            unique_together={('test', 'question')},
+        ),
+    ]
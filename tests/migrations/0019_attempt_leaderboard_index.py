@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0018_scoredistribution'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(condition=models.Q(('status', 'COMPLETED')), fields=['test', '-score', 'completed_at', 'id'], name='attempt_leaderboard'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_history_at(apps, schema_editor):
+    """history_at = completed_at for completed attempts, started_at otherwise."""
+    TestAttempt = apps.get_model("tests", "TestAttempt")
+    TestAttempt.objects.filter(status="COMPLETED", completed_at__isnull=False).update(
+        history_at=F("completed_at")
+    )
+    TestAttempt.objects.filter(history_at__isnull=True).update(history_at=F("started_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0019_attempt_leaderboard_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='history_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_history_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='testattempt',
+            name='history_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(fields=['user', '-history_at', '-id'], name='tests_testa_user_id_ee1c4b_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tests', '0020_testattempt_history_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='progress_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils.functional import cached_property
 from accounts.models import User
 from django.utils import timezone
 from datetime import timedelta
@@ -21,6 +22,11 @@ class Test(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    paper_pool_size = models.PositiveIntegerField(
+        default=0,
+        help_text="Randomized papers kept pre-generated while published (0 disables)",
+    )
+
     
     
 class QuestionCategory(models.Model):
@@ -76,6 +82,21 @@ class Question(models.Model):
         return self.question_text[:50]
     
     
+class QuestionPoolSnapshot(models.Model):
+    """Frozen candidate question ids of a test, used to re-derive seeded attempts."""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name="pool_snapshots")
+    fingerprint = models.CharField(max_length=64)
+    # [[category_id, number_of_questions, [question_id, ...]], ...]
+    candidates = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("test", "fingerprint")
+
+    def __str__(self):
+        return f"{self.test.name} pool {self.fingerprint[:8]}"
+
+
 class TestAttempt(models.Model):
     user = models.ForeignKey(
         User,
@@ -88,8 +109,15 @@ class TestAttempt(models.Model):
         related_name="attempts"
     )
     score = models.IntegerField(default=0)
+    # Running counters moved by every answer write (see tests/answers.py)
+    answered_count = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
     started_at = models.DateTimeField(auto_now_add=True)
+    # started_at + test.duration, stored so expiry can be filtered in SQL
+    ends_at = models.DateTimeField()
     completed_at = models.DateTimeField(null=True, blank=True)
+    # Attempt history sort key: the start, then the completion once completed
+    history_at = models.DateTimeField()
 
     status = models.CharField(
         max_length=10,
@@ -97,21 +125,129 @@ class TestAttempt(models.Model):
         default="ONGOING"
     )
 
+    # Result summary, filled once at completion (see ``summarize``)
+    max_score = models.PositiveIntegerField(null=True, blank=True)
+    percentage = models.FloatField(null=True, blank=True)
+    passed = models.BooleanField(null=True, blank=True)
+    time_taken_seconds = models.PositiveIntegerField(null=True, blank=True)
+
+    # Seed storage: questions are re-derived from (pool_snapshot, question_seed)
+    # instead of being stored as AttemptCategory.question_set rows
+    question_seed = models.BigIntegerField(null=True, blank=True)
+    pool_snapshot = models.ForeignKey(
+        QuestionPoolSnapshot,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="attempts"
+    )
+
+    # Answers packed into a single AnswerSheet row instead of UserAnswer rows
+    uses_answer_sheet = models.BooleanField(default=False)
+
+    # Whether the attempt is counted in ItemStatistics yet (tests/item_analysis.py)
+    item_analyzed = models.BooleanField(default=False)
+
+    class Meta:
+        # Finding expired ongoing attempts (tests/completion.py)
+        indexes = [
+            models.Index(fields=["status", "ends_at"]),
+            # Results lists filtered by outcome and ranked by percentage
+            models.Index(fields=["test", "passed"]),
+            models.Index(fields=["test", "-percentage"]),
+            # Admin results keyset pages (tests/pagination.py)
+            models.Index(fields=["status", "-completed_at", "-id"]),
+            models.Index(fields=["test", "status", "-completed_at", "-id"]),
+            # Completed attempts the item analysis has not seen yet
+            models.Index(
+                fields=["test", "id"],
+                condition=models.Q(status="COMPLETED", item_analyzed=False),
+                name="attempt_pending_item_analysis",
+            ),
+            # Attempt history keyset pages (tests/pagination.py)
+            models.Index(fields=["user", "-history_at", "-id"]),
+            # Leaderboard keyset pages (tests/pagination.py)
+            models.Index(
+                fields=["test", "-score", "completed_at", "id"],
+                condition=models.Q(status="COMPLETED"),
+                name="attempt_leaderboard",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.test.name} ({self.status})"
 
+    # 🔹 Questions of this attempt, grouped by category
+    @cached_property
+    def question_layout(self):
+        """[(category_id, [question_id, ...]), ...] whatever the storage mode."""
+        from .question_pool import derive_layout, get_snapshot_candidates
+
+        if self.question_seed is not None:
+            candidates = get_snapshot_candidates(self.pool_snapshot_id)
+            return derive_layout(candidates, self.question_seed)
+
+        layout = {}
+        rows = (
+            AttemptCategory.question_set.through.objects
+            .filter(attemptcategory__attempt_id=self.id)
+            .order_by("attemptcategory_id", "question_id")
+            .values_list("attemptcategory__category_id", "question_id")
+        )
+        for category_id, question_id in rows:
+            layout.setdefault(category_id, []).append(question_id)
+        return list(layout.items())
+
+    @cached_property
+    def question_ids(self):
+        return frozenset(
+            question_id
+            for _, question_ids in self.question_layout
+            for question_id in question_ids
+        )
+
+    @cached_property
+    def question_order(self):
+        """Question ids in layout order, the order answer sheets are packed in."""
+        return [
+            question_id
+            for _, question_ids in self.question_layout
+            for question_id in question_ids
+        ]
+
+    @cached_property
+    def selected_options(self):
+        """{question_id: selected_option} whatever the answer storage mode."""
+        from .answers import load_answers
+
+        return load_answers(self)
+
+    @cached_property
+    def questions_by_category(self):
+        """{category_id: [Question, ...]} loaded with a single query."""
+        questions = Question.objects.in_bulk(self.question_ids)
+        return {
+            category_id: [questions[qid] for qid in question_ids if qid in questions]
+            for category_id, question_ids in self.question_layout
+        }
+
+    def save(self, *args, **kwargs):
+        if self.ends_at is None:
+            self.ends_at = timezone.now() + timedelta(minutes=self.test.duration)
+        if self.history_at is None:
+            self.history_at = self.completed_at or timezone.now()
+        super().save(*args, **kwargs)
+
     # 🔹 Check if test time is over
     def is_time_over(self):
-        end_time = self.started_at + timedelta(minutes=self.test.duration)
-        return timezone.now() >= end_time
+        return timezone.now() >= self.ends_at
 
     # 🔹 Remaining seconds (for frontend timer)
     def time_left(self):
       if self.status == "COMPLETED":
             return "00 min 00 sec"
 
-      end_time = self.started_at + timedelta(minutes=self.test.duration)
-      remaining = end_time - timezone.now()
+      remaining = self.ends_at - timezone.now()
 
       if remaining.total_seconds() <= 0:
             return "00 min 00 sec"
@@ -122,11 +258,8 @@ class TestAttempt(models.Model):
 
     # 🔹 Pass / Fail logic
     def calculate_pass_fail(self):
-        # Calculate total marks from questions assigned in this attempt
-        total_marks = 0
-        for cat in self.categories.prefetch_related('question_set').all():
-            for q in cat.question_set.all().distinct():
-                total_marks += getattr(q, 'marks', 0)
+        # score is kept up to date while answering, so this needs no queries
+        total_marks = self.test.total_marks
 
         # Prefer explicit passing_marks on Test, fallback to percentage-based or 50%
         if getattr(self.test, 'passing_marks', None) is not None:
@@ -141,6 +274,30 @@ class TestAttempt(models.Model):
             "status": "PASS" if passed else "FAIL"
         }
 
+    # 🔹 Result summary columns
+    def summarize(self, max_score=None):
+        """
+        Fill max_score (the total marks of the attempt's questions, the scale
+        ``score`` is on), percentage, passed and time_taken_seconds (not saved).
+        """
+        if max_score is None:
+            max_score = Question.objects.filter(id__in=self.question_ids).aggregate(
+                total=models.Sum("marks")
+            )["total"] or 0
+        self.max_score = max_score
+        self.percentage = round((self.score / max_score) * 100, 2) if max_score else 0
+        self.passed = self.calculate_pass_fail()["passed"]
+        self.time_taken_seconds = (
+            max(0, int((self.completed_at - self.started_at).total_seconds()))
+            if self.completed_at else None
+        )
+
+    def time_taken(self):
+        if self.time_taken_seconds is None:
+            return None
+        minutes, seconds = divmod(self.time_taken_seconds, 60)
+        return f"{minutes} min {seconds} sec"
+
     
     
 class AttemptCategory(models.Model):
@@ -156,6 +313,59 @@ class AttemptCategory(models.Model):
         return f"{self.attempt} - {self.category.name}"
 
 
+class QuestionPaper(models.Model):
+    """A pre-generated randomized question selection for a test."""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name="papers")
+    # [[category_id, [question_id, ...]], ...] in TestCategoryConfig order
+    layout = models.JSONField()
+    attempt = models.OneToOneField(
+        TestAttempt,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="paper"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["test", "attempt"])]
+
+    def __str__(self):
+        return f"{self.test.name} paper #{self.pk}"
+
+
+class AttemptResult(models.Model):
+    """Result document of a completed attempt, rendered once (see tests/results.py)."""
+    attempt = models.OneToOneField(
+        TestAttempt,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="result"
+    )
+    # Compact JSON, served without decoding
+    document = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Result of attempt #{self.attempt_id}"
+
+
+class AnswerSheet(models.Model):
+    """All answers of an attempt packed 3 bits per question in question_order."""
+    attempt = models.OneToOneField(
+        TestAttempt,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="answer_sheet"
+    )
+    # 0 = unanswered, 1-4 = A-D; little-endian, question i at bits 3i..3i+2
+    packed = models.BinaryField(default=bytes)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.attempt} answer sheet"
+
+
 class UserAnswer(models.Model):
     attempt = models.ForeignKey(TestAttempt, on_delete=models.CASCADE, related_name="answers")
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
@@ -163,11 +373,168 @@ class UserAnswer(models.Model):
     is_correct = models.BooleanField(default=False)
     answered_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["attempt", "question"], name="unique_answer_per_question"),
+        ]
+
     def __str__(self):
         return f"{self.attempt.user.username} - Q{self.question.id} - {self.selected_option}"
 
 
+class ExportJob(models.Model):
+    """A results export written to disk by the export worker (see tests/export_jobs.py)."""
+    KINDS = [("results", "Results CSV"), ("test_bundle", "Per-attempt CSVs of a test")]
+    STATUSES = [
+        ("PENDING", "Pending"),
+        ("RUNNING", "Running"),
+        ("DONE", "Done"),
+        ("FAILED", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    params = models.JSONField(default=dict, blank=True)
+    # sha256 of kind + params, identical exports share one active job
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUSES, default="PENDING")
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="export_jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Last sign of life of the worker, see export_jobs.fail_stale_jobs
+    progress_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["fingerprint"],
+                condition=models.Q(status__in=["PENDING", "RUNNING"]),
+                name="unique_active_export",
+            ),
+        ]
+        indexes = [models.Index(fields=["status", "created_at"])]
 
+    def __str__(self):
+        return f"{self.get_kind_display()} export #{self.pk} ({self.status})"
+
+
+class ItemStatistics(models.Model):
+    """
+    Classical item statistics of a question within a test (see
+    tests/item_analysis.py). The counters and sums are additive, so new
+    attempts are merged in without re-reading old ones; p_value and
+    point_biserial are derived from them after every merge.
+    """
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name="item_statistics")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="item_statistics")
+
+    presented = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    blank = models.PositiveIntegerField(default=0)
+    chose_a = models.PositiveIntegerField(default=0)
+    chose_b = models.PositiveIntegerField(default=0)
+    chose_c = models.PositiveIntegerField(default=0)
+    chose_d = models.PositiveIntegerField(default=0)
+    # Sums over presented attempts of the rest score (score without this item)
+    sum_rest = models.FloatField(default=0)
+    sum_rest_sq = models.FloatField(default=0)
+    sum_rest_correct = models.FloatField(default=0)
+
+    p_value = models.FloatField(null=True, blank=True)
+    point_biserial = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        unique_together = ("test", "question")
 
+    def __str__(self):
+        return f"{self.test.name} - Q{self.question_id} statistics"
+
+    def option_rates(self):
+        """Share of presented attempts that chose each option."""
+        counts = {"A": self.chose_a, "B": self.chose_b, "C": self.chose_c, "D": self.chose_d}
+        return {
+            option: round(count / self.presented, 4) if self.presented else None
+            for option, count in counts.items()
+        }
+
+
+class ScoreDistribution(models.Model):
+    """
+    Score histogram of a test's completed attempts, kept current at every
+    completion (see tests/score_distribution.py). ``histogram[s]`` is the
+    number of attempts that scored ``s``; histograms of the same test add
+    up bin by bin, so batches merge without re-reading attempts.
+    """
+    test = models.OneToOneField(
+        Test,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="score_distribution",
+    )
+    count = models.PositiveIntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+    histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.test.name} score distribution ({self.count})"
+
+    def add(self, scores):
+        """Merge ``{score: attempts}`` into the histogram."""
+        for score, attempts in scores.items():
+            if score >= len(self.histogram):
+                self.histogram.extend([0] * (score + 1 - len(self.histogram)))
+            self.histogram[score] += attempts
+            self.count += attempts
+            self.total += score * attempts
+
+    def percentile(self, percent):
+        """Nearest-rank percentile of the scores; None without attempts."""
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for score, attempts in enumerate(self.histogram):
+            seen += attempts
+            if seen >= rank:
+                return score
+
+    def rank(self, score):
+        """Competition rank of ``score``: one more than the attempts that scored higher."""
+        return 1 + sum(self.histogram[score + 1:])
+
+    def standing(self, score):
+        """
+        ``{"rank", "percentile"}`` of a completed attempt that scored ``score``;
+        the percentile is the share of the other attempts it scored above.
+        """
+        if score >= len(self.histogram) or not self.histogram[score]:
+            # Not merged yet (older attempts before a rebuild)
+            return {"rank": None, "percentile": None}
+        below = sum(self.histogram[:score])
+        others = self.count - 1
+        return {
+            "rank": self.rank(score),
+            "percentile": round(below * 100 / others, 1) if others else None,
+        }
+
+    def summary(self):
+        scores = [score for score, attempts in enumerate(self.histogram) if attempts]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 2) if self.count else None,
+            "min": scores[0] if scores else None,
+            "max": scores[-1] if scores else None,
+            "median": self.percentile(50),
+            "p90": self.percentile(90),
+            "histogram": [
+                {"score": score, "count": self.histogram[score]} for score in scores
+            ],
+        }
 
@@ -1,6 +1,145 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
 
-class AdminResultsPagination(PageNumberPagination):
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination: rows come in ``ordering`` and the cursor holds the
+    last row's ordering values, so every page is the same index range scan
+    however deep it is. There is no total count.
+
+    Subclasses set ``ordering`` and implement ``cursor_values``,
+    ``parse_cursor`` and ``after_cursor``.
+    """
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
+    cursor_query_param = "cursor"
+    ordering = ()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Works with plain Django requests too, for the server-rendered pages."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.after_cursor(*cursor))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.page = rows[:self.page_size]
+        self.has_next = len(rows) > self.page_size
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(self.query_params(request)[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def query_params(self, request):
+        return getattr(request, "query_params", request.GET)
+
+    def cursor_values(self, row):
+        """Ordering values of ``row`` as strings."""
+        raise NotImplementedError
+
+    def parse_cursor(self, values):
+        """Inverse of ``cursor_values``; raise ValueError on bad input."""
+        raise NotImplementedError
+
+    def after_cursor(self, *values):
+        """Q of the rows that come after the cursor in ``ordering``."""
+        raise NotImplementedError
+
+    def decode_cursor(self, request):
+        encoded = self.query_params(request).get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            return self.parse_cursor(base64.urlsafe_b64decode(encoded.encode()).decode().split("|"))
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound("Invalid cursor")
+
+    def encode_cursor(self, row):
+        raw = "|".join(self.cursor_values(row))
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+
+def parse_timestamp(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(value)
+    return moment
+
+
+class AdminResultsPagination(KeysetPagination):
+    """Completed attempts, newest first: (completed_at, id) descending."""
+    ordering = ("-completed_at", "-id")
+
+    def cursor_values(self, attempt):
+        return attempt.completed_at.isoformat(), str(attempt.pk)
+
+    def parse_cursor(self, values):
+        completed_at, pk = values
+        return parse_timestamp(completed_at), int(pk)
+
+    def after_cursor(self, completed_at, pk):
+        return Q(completed_at__lt=completed_at) | Q(completed_at=completed_at, id__lt=pk)
+
+
+class AttemptHistoryPagination(KeysetPagination):
+    """A user's attempts, latest first: (history_at, id) descending."""
+    ordering = ("-history_at", "-id")
+
+    def cursor_values(self, attempt):
+        return attempt.history_at.isoformat(), str(attempt.pk)
+
+    def parse_cursor(self, values):
+        history_at, pk = values
+        return parse_timestamp(history_at), int(pk)
+
+    def after_cursor(self, history_at, pk):
+        return Q(history_at__lt=history_at) | Q(history_at=history_at, id__lt=pk)
+
+
+class LeaderboardPagination(KeysetPagination):
+    """
+    Completed attempts of a test, best first: score descending, then the
+    earlier completion and the lower id.
+    """
+    ordering = ("-score", "completed_at", "id")
+
+    def cursor_values(self, attempt):
+        return str(attempt.score), attempt.completed_at.isoformat(), str(attempt.pk)
+
+    def parse_cursor(self, values):
+        score, completed_at, pk = values
+        return int(score), parse_timestamp(completed_at), int(pk)
+
+    def after_cursor(self, score, completed_at, pk):
+        return (
+            Q(score__lt=score)
+            | Q(score=score, completed_at__gt=completed_at)
+            | Q(score=score, completed_at=completed_at, id__gt=pk)
+        )
@@ -0,0 +1,86 @@
+"""
+Pre-generated question papers.
+
+Publishing a test with ``paper_pool_size`` set fills a pool of randomized
+papers ahead of time, so starting an attempt only has to claim one with a
+single ``UPDATE ... RETURNING`` instead of sampling under load. The
+``refill_question_papers`` command keeps the pool topped up.
+
+Papers only apply to row storage; seed-stored attempts already derive
+their questions from a seed and have nothing to pre-generate.
+"""
+import random
+
+from django.db import connection
+
+from .assembly import category_configs, pick_questions, uses_seed_storage
+from .models import QuestionPaper
+
+
+def unclaimed_papers(test_id):
+    return QuestionPaper.objects.filter(test_id=test_id, attempt__isnull=True)
+
+
+def paper_pool_depth(test_id):
+    """Number of papers still waiting to be claimed for a test."""
+    return unclaimed_papers(test_id).count()
+
+
+def refill_papers(test, rng=random):
+    """Top the pool of ``test`` up to ``test.paper_pool_size``; return how many were added."""
+    if uses_seed_storage():
+        return 0
+
+    missing = test.paper_pool_size - paper_pool_depth(test.id)
+    if missing <= 0:
+        return 0
+
+    configs = category_configs(test)
+    QuestionPaper.objects.bulk_create(
+        QuestionPaper(test=test, layout=pick_questions(test, rng, configs))
+        for _ in range(missing)
+    )
+    return missing
+
+
+def discard_papers(test_id):
+    """Drop every unclaimed paper of a test, e.g. when it is unpublished."""
+    unclaimed_papers(test_id).delete()
+
+
+def discard_papers_for_category(category_id):
+    """Drop unclaimed papers of every test drawing questions from a category."""
+    QuestionPaper.objects.filter(
+        attempt__isnull=True,
+        test__category_configs__category_id=category_id,
+    ).delete()
+
+
+def claim_paper(attempt):
+    """
+    Attach an unused paper to ``attempt`` and return its layout, with one
+    ``UPDATE ... RETURNING`` whose subquery skips papers locked by
+    concurrent claims.
+
+    Must run inside a transaction. Returns None when the pool is empty or
+    every candidate is being claimed concurrently.
+    """
+    table = QuestionPaper._meta.db_table
+    skip_locked = " FOR UPDATE SKIP LOCKED" if connection.features.has_select_for_update_skip_locked else ""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} SET attempt_id = %s
+            WHERE attempt_id IS NULL AND id = (
+                SELECT id FROM {table}
+                WHERE test_id = %s AND attempt_id IS NULL
+                ORDER BY id LIMIT 1{skip_locked}
+            )
+            RETURNING layout
+            """,
+            [attempt.id, attempt.test_id],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return QuestionPaper._meta.get_field("layout").from_db_value(row[0], None, connection)
@@ -0,0 +1,180 @@
+"""
+In-process cache of active question ids per QuestionCategory.
+
+Each category's pool is held as a compact ``array('q')`` of question ids and
+tagged with a version token kept in the Django cache. Saving or deleting a
+Question bumps the token once its transaction commits (see
+``tests.signals``), so every worker reloads
+the pool on its next use instead of scanning the question table per start.
+
+Seed-stored attempts freeze the pools of their test in a
+QuestionPoolSnapshot and keep only a seed; ``derive_layout`` replays the
+same selection from the two whenever the attempt's questions are needed.
+"""
+import hashlib
+import json
+import random
+import threading
+import uuid
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Question, QuestionPoolSnapshot
+
+
+VERSION_KEY = "question_pool:version:{}"
+# Every pool change adds a key, so only the most recently used are kept
+SNAPSHOT_CACHE_SIZE = 512
+
+_pools = {}
+_snapshots = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_pool_version(category_id):
+    """Return the current version token for a category's pool."""
+    key = VERSION_KEY.format(category_id)
+    version = cache.get(key)
+    if version is None:
+        # add() keeps the first token if another worker raced us here
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_category(category_id):
+    """Drop the cached pool for a category in every worker once the current transaction commits."""
+    if category_id is None:
+        return
+
+    def bump():
+        cache.set(VERSION_KEY.format(category_id), uuid.uuid4().hex, timeout=None)
+        with _lock:
+            _pools.pop(category_id, None)
+
+    # Bumping earlier would let a worker reload the old rows under the new token
+    transaction.on_commit(bump)
+
+
+def get_active_question_ids(category_id):
+    """Return the active question ids of a category as an ``array('q')``."""
+    version = get_pool_version(category_id)
+    cached = _pools.get(category_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    ids = array(
+        "q",
+        Question.objects.filter(question_category_id=category_id, is_active=True)
+        .order_by("id")
+        .values_list("id", flat=True),
+    )
+    with _lock:
+        _pools[category_id] = (version, ids)
+    return ids
+
+
+def sample_question_ids(category_id, count, rng=random):
+    """Randomly pick up to ``count`` active question ids from a category."""
+    ids = get_active_question_ids(category_id)
+    return rng.sample(ids, min(len(ids), count))
+
+
+def current_snapshot(test):
+    """Return the QuestionPoolSnapshot matching the current pools of ``test``."""
+    configs = tuple(
+        test.category_configs.order_by("id").values_list("category_id", "number_of_questions")
+    )
+    key = (test.id, tuple(
+        (category_id, count, get_pool_version(category_id)) for category_id, count in configs
+    ))
+    with _lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None:
+            _snapshots.move_to_end(key)
+            return snapshot
+
+    snapshot = snapshot_for(test.id, [
+        [category_id, count, list(get_active_question_ids(category_id))]
+        for category_id, count in configs
+    ])
+    with _lock:
+        _snapshots[key] = snapshot
+        _snapshots.move_to_end(key)
+        while len(_snapshots) > SNAPSHOT_CACHE_SIZE:
+            _snapshots.popitem(last=False)
+    return snapshot
+
+
+def pool_fingerprint(candidates):
+    return hashlib.sha256(json.dumps(candidates, separators=(",", ":")).encode()).hexdigest()
+
+
+def snapshot_for(test_id, candidates):
+    """Get or create the snapshot of ``test_id`` holding exactly ``candidates``."""
+    snapshot, _ = QuestionPoolSnapshot.objects.get_or_create(
+        test_id=test_id, fingerprint=pool_fingerprint(candidates), defaults={"candidates": candidates}
+    )
+    return snapshot
+
+
+def bulk_snapshot_ids(candidates_by_test):
+    """
+    ``{(test_id, fingerprint): snapshot_id}`` for ``[(test_id, candidates), ...]``,
+    creating the missing snapshots with one insert.
+    """
+    wanted = {
+        (test_id, pool_fingerprint(candidates)): candidates
+        for test_id, candidates in candidates_by_test
+    }
+    if not wanted:
+        return {}
+    QuestionPoolSnapshot.objects.bulk_create(
+        [
+            QuestionPoolSnapshot(test_id=test_id, fingerprint=fingerprint, candidates=candidates)
+            for (test_id, fingerprint), candidates in wanted.items()
+        ],
+        ignore_conflicts=True,
+    )
+    return {
+        (test_id, fingerprint): snapshot_id
+        for test_id, fingerprint, snapshot_id in QuestionPoolSnapshot.objects.filter(
+            test_id__in={test_id for test_id, _ in wanted},
+            fingerprint__in={fingerprint for _, fingerprint in wanted},
+        ).values_list("test_id", "fingerprint", "id")
+        if (test_id, fingerprint) in wanted
+    }
+
+
+@lru_cache(maxsize=1024)
+def _load_candidates(snapshot_id):
+    candidates = QuestionPoolSnapshot.objects.values_list("candidates", flat=True).get(pk=snapshot_id)
+    return tuple(
+        (category_id, count, tuple(question_ids)) for category_id, count, question_ids in candidates
+    )
+
+
+def get_snapshot_candidates(snapshot_id):
+    """Candidates of a snapshot; snapshots never change so they are cached for good."""
+    return _load_candidates(snapshot_id)
+
+
+@lru_cache(maxsize=4096)
+def _derive(candidates, seed):
+    rng = random.Random(seed)
+    return tuple(
+        (category_id, list(ids) if count >= len(ids) else rng.sample(ids, count))
+        for category_id, count, ids in candidates
+    )
+
+
+def derive_layout(candidates, seed):
+    """Deterministically replay the question selection of a seeded attempt."""
+    candidates = tuple(
+        (category_id, count, tuple(ids)) for category_id, count, ids in candidates
+    )
+    return [(category_id, list(ids)) for category_id, ids in _derive(candidates, seed)]
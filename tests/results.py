@@ -0,0 +1,107 @@
+"""
+Materialized attempt results.
+
+A completed attempt's result never changes, so the document served by the
+result API and page is rendered once when the attempt completes and kept
+as compact JSON in AttemptResult. Serving it is a single primary-key read
+and the stored text is returned as is, apart from the rank and percentile,
+which move as other attempts complete: they are left out of the stored
+document and appended when it is served. Attempts completed before results
+were stored get theirs rendered on first read. Completions render their
+attempts together: layouts, answers, questions and categories are loaded
+once per call, whatever the number of attempts.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .attempt_data import bulk_question_layouts, bulk_selections
+from .models import AttemptCategory, AttemptResult, Question, ScoreDistribution, TestAttempt
+from .score_distribution import NO_STANDING, attempt_standing
+
+
+def render_result(attempt):
+    """The result document of ``attempt`` as compact JSON text."""
+    from .serializers import TestResultSerializer
+
+    return json.dumps(
+        TestResultSerializer(attempt, context={"with_standing": False}).data,
+        cls=DjangoJSONEncoder,
+        separators=(",", ":"),
+    )
+
+
+def with_standing(document, standing):
+    """Append the ``standing`` keys to a stored JSON object document."""
+    return document[:-1] + "," + json.dumps(standing, separators=(",", ":"))[1:]
+
+
+def prime_attempts(attempts):
+    """
+    Fill the layout, answer and question accessors of ``attempts`` with a
+    fixed number of bulk queries, so rendering them needs no more.
+    """
+    layouts = bulk_question_layouts(attempts)
+    orders = {
+        attempt_id: [question_id for _, question_ids in layout for question_id in question_ids]
+        for attempt_id, layout in layouts.items()
+    }
+    selected = bulk_selections(attempts, orders)
+    questions = Question.objects.in_bulk({qid for order in orders.values() for qid in order})
+    for attempt in attempts:
+        attempt.question_layout = layouts[attempt.id]
+        attempt.selected_options = selected[attempt.id]
+        attempt.questions_by_category = {
+            category_id: [questions[qid] for qid in question_ids if qid in questions]
+            for category_id, question_ids in layouts[attempt.id]
+        }
+
+
+def store_results(attempt_ids):
+    """Render and store the result of every completed attempt in ``attempt_ids`` that lacks one."""
+    attempts = list(
+        TestAttempt.objects.filter(
+            id__in=list(attempt_ids), status="COMPLETED", result__isnull=True
+        ).select_related("test").prefetch_related(
+            Prefetch("categories", queryset=AttemptCategory.objects.select_related("category"))
+        )
+    )
+    prime_attempts(attempts)
+    AttemptResult.objects.bulk_create(
+        [AttemptResult(attempt=attempt, document=render_result(attempt)) for attempt in attempts],
+        ignore_conflicts=True,
+    )
+
+
+def get_result_document(attempt_id, user_id):
+    """
+    JSON result of one of ``user_id``'s attempts, or None if there is no
+    such attempt. Ongoing attempts are rendered live and not stored.
+    """
+    # The test's score distribution comes along in the same query
+    stored = AttemptResult.objects.filter(
+        attempt_id=attempt_id, attempt__user_id=user_id
+    ).values_list(
+        "document",
+        "attempt__score",
+        "attempt__test__score_distribution__count",
+        "attempt__test__score_distribution__histogram",
+    ).first()
+    if stored is not None:
+        document, score, count, histogram = stored
+        if count is None:
+            return with_standing(document, NO_STANDING)
+        distribution = ScoreDistribution(count=count, histogram=histogram)
+        return with_standing(document, distribution.standing(score))
+
+    attempt = TestAttempt.objects.select_related("test").filter(id=attempt_id, user_id=user_id).first()
+    if attempt is None:
+        return None
+    standing = attempt_standing(attempt.test_id, attempt.score, attempt.status)
+    if attempt.status != "COMPLETED":
+        return with_standing(render_result(attempt), standing)
+
+    store_results([attempt.id])
+    document = AttemptResult.objects.values_list("document", flat=True).get(attempt_id=attempt.id)
+    return with_standing(document, standing)
@@ -1,11 +1,30 @@
 from rest_framework import serializers
-from .models import Test, TestCategoryConfig , QuestionCategory, TestAttempt, AttemptCategory, Question, UserAnswer
-from django.utils import timezone
+from .models import Test, TestCategoryConfig , QuestionCategory, TestAttempt, AttemptCategory, Question, UserAnswer, ExportJob, ItemStatistics
+from django.urls import reverse
+from .answers import record_answer
+from .assembly import assemble_attempt
+from .completion import complete_attempt
+from .papers import discard_papers, refill_papers
+from .score_distribution import attempt_standing
 from datetime import timedelta
 
 
 
 
+class CatalogueTestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Test
+        fields = [
+            "id",
+            "name",
+            "description",
+            "duration",
+            "max_questions",
+            "total_marks",
+            "passing_marks",
+        ]
+
+
 class QuestionCategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = QuestionCategory
@@ -23,6 +42,7 @@ class TestCreateSerializer(serializers.ModelSerializer):
             "max_questions",
             "total_marks",
             "passing_marks",
+            "paper_pool_size",
             "status",
             "created_at",
         ]
@@ -75,6 +95,8 @@ class TestCategoryConfigSerializer(serializers.ModelSerializer):
 
 
 class PublishTestSerializer(serializers.Serializer):
+    paper_pool_size = serializers.IntegerField(required=False, min_value=0)
+
     def validate(self, attrs):
         test = self.context["test"]
 
@@ -102,8 +124,14 @@ class PublishTestSerializer(serializers.Serializer):
 
     def save(self, **kwargs):
         test = self.context["test"]
+        if "paper_pool_size" in self.validated_data:
+            test.paper_pool_size = self.validated_data["paper_pool_size"]
         test.status = "PUBLISHED"
         test.save()
+
+        # Optionally pre-build randomized papers so starts only claim one
+        if test.paper_pool_size:
+            refill_papers(test)
         return test
 
 
@@ -119,6 +147,7 @@ class UnpublishTestSerializer(serializers.Serializer):
         test = self.context['test']
         test.status = 'DRAFT'
         test.save()
+        discard_papers(test.id)
         return test
     
 
@@ -167,29 +196,7 @@ class StartTestSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         user = self.context["request"].user
-        test = self.test
-
-        # Create TestAttempt
-        attempt = TestAttempt.objects.create(user=user, test=test)
-
-        # For each category in test, pick questions
-        category_configs = test.category_configs.all()
-        for config in category_configs:
-            questions = list(config.category.category_questions.all())
-            # Randomly select required number
-            import random
-            selected_questions = random.sample(
-                questions, min(len(questions), config.number_of_questions)
-            )
-
-            # Create AttemptCategory
-            attempt_category = AttemptCategory.objects.create(
-                attempt=attempt,
-                category=config.category
-            )
-            attempt_category.question_set.set(selected_questions)
-
-        return attempt
+        return assemble_attempt(user, self.test)
     
     
 class AttemptCategoryQuestionSerializer(serializers.ModelSerializer):
@@ -205,9 +212,7 @@ class AttemptCategoryQuestionSerializer(serializers.ModelSerializer):
         return obj.category.name if obj.category else None
 
     def get_questions(self, obj):
-        # Make sure you are using the correct related_name for questions
-        # e.g., if TestQuestion model has FK AttemptCategory with related_name='questions':
-        questions = obj.question_set.all()  # replace with correct related_name
+        questions = obj.attempt.questions_by_category.get(obj.category_id, [])
         return QuestionSerializer(questions, many=True).data
 
 
@@ -231,8 +236,7 @@ class SubmitAnswerSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("This attempt does not belong to you.")
 
         # Check question belongs to attempt
-        attempt_questions = attempt.categories.values_list("question_set", flat=True)
-        if question.id not in attempt_questions:
+        if question.id not in attempt.question_ids:
             raise serializers.ValidationError("Question does not belong to this test attempt.")
 
         return attrs
@@ -242,19 +246,16 @@ class SubmitAnswerSerializer(serializers.ModelSerializer):
         attempt = validated_data["attempt"]
         selected_option = validated_data["selected_option"]
 
-        # Check correctness
-        is_correct = question.correct_option == selected_option
-
-        # Create or update UserAnswer
-        user_answer, created = UserAnswer.objects.update_or_create(
+        # Save through the attempt's answer storage
+        is_correct = record_answer(attempt, question, selected_option)
+        return UserAnswer(
             attempt=attempt,
             question=question,
-            defaults={"selected_option": selected_option, "is_correct": is_correct},
+            selected_option=selected_option,
+            is_correct=is_correct,
         )
-        return user_answer
     
     
-from django.utils import timezone
 
 class SubmitTestSerializer(serializers.Serializer):
     attempt_id = serializers.IntegerField()
@@ -270,30 +271,15 @@ class SubmitTestSerializer(serializers.Serializer):
 
         # 🔴 ADD THIS
         if attempt.is_time_over():
-            attempt.status = "COMPLETED"
-            attempt.completed_at = timezone.now()
-            attempt.save()
+            complete_attempt(attempt, completed_at=attempt.ends_at)
             raise serializers.ValidationError("Test time is over.")
 
         self.attempt = attempt
         return value
     
     def save(self, **kwargs):
-     attempt = self.attempt
-
-     answers = attempt.answers.select_related("question")
-     score = sum(
-        ans.question.marks
-        for ans in answers
-        if ans.is_correct
-    )
-
-     attempt.score = score
-     attempt.status = "COMPLETED"
-     attempt.completed_at = timezone.now()
-     attempt.save()
-
-     return attempt
+     # The running score becomes the result once buffered answers are in
+     return complete_attempt(self.attempt)
 
 
     
@@ -317,22 +303,20 @@ class UserAnswerResultSerializer(serializers.ModelSerializer):
             "attempted",
         ]
 
-    def _get_answer(self, obj):
+    def _get_selected(self, obj):
         attempt = self.context.get("attempt")
         if not attempt:
             return None
-        return attempt.answers.filter(question=obj).first()
+        return attempt.selected_options.get(obj.id)
 
     def get_selected_option(self, obj):
-        answer = self._get_answer(obj)
-        return answer.selected_option if answer else None
+        return self._get_selected(obj)
 
     def get_is_correct(self, obj):
-        answer = self._get_answer(obj)
-        return bool(answer and answer.selected_option == obj.correct_option)
+        return self._get_selected(obj) == obj.correct_option
 
     def get_attempted(self, obj):
-        return self._get_answer(obj) is not None
+        return self._get_selected(obj) is not None
 
     def get_options(self, obj):
         return {
@@ -353,7 +337,7 @@ class CategoryResultSerializer(serializers.ModelSerializer):
         fields = ["category_name", "category_score", "questions"]
 
     def get_questions(self, obj):
-        questions = obj.question_set.all().distinct()
+        questions = obj.attempt.questions_by_category.get(obj.category_id, [])
 
         serializer = UserAnswerResultSerializer(
             questions,
@@ -365,11 +349,8 @@ class CategoryResultSerializer(serializers.ModelSerializer):
     def get_category_score(self, obj):
         return sum(
             1
-            for question in obj.question_set.all().distinct()
-            if obj.attempt.answers.filter(
-                question=question,
-                selected_option=question.correct_option
-            ).exists()
+            for question in obj.attempt.questions_by_category.get(obj.category_id, [])
+            if obj.attempt.selected_options.get(question.id) == question.correct_option
         )
 
 
@@ -377,11 +358,11 @@ class CategoryResultSerializer(serializers.ModelSerializer):
 
 class TestResultSerializer(serializers.ModelSerializer):
     categories = serializers.SerializerMethodField()
-    max_score = serializers.SerializerMethodField()
-    percentage = serializers.SerializerMethodField()
-    passed = serializers.SerializerMethodField()
     time_taken = serializers.SerializerMethodField()
     test_name = serializers.SerializerMethodField()
+    # Live standing among the test's completed attempts
+    rank = serializers.IntegerField(source="standing.rank", read_only=True, allow_null=True)
+    percentile = serializers.FloatField(source="standing.percentile", read_only=True, allow_null=True)
 
     class Meta:
         model = TestAttempt
@@ -396,13 +377,27 @@ class TestResultSerializer(serializers.ModelSerializer):
             "passed",
             "categories",
             "time_taken",
+            "rank",
+            "percentile",
         ]
 
+    def get_fields(self):
+        fields = super().get_fields()
+        # Stored result documents get the standing appended when served
+        if not self.context.get("with_standing", True):
+            fields.pop("rank")
+            fields.pop("percentile")
+        return fields
+
     def get_categories(self, obj):
         seen = set()
         unique_categories = []
 
-        for cat in obj.categories.select_related("category").prefetch_related("question_set"):
+        # results.store_results prefetches the categories of a whole batch
+        categories = getattr(obj, "_prefetched_objects_cache", {}).get("categories")
+        if categories is None:
+            categories = obj.categories.select_related("category")
+        for cat in categories:
             if cat.category_id not in seen:
                 seen.add(cat.category_id)
                 unique_categories.append(cat)
@@ -410,26 +405,16 @@ class TestResultSerializer(serializers.ModelSerializer):
         serializer = CategoryResultSerializer(unique_categories, many=True)
         return serializer.data
 
-    def get_max_score(self, obj):
-        return sum(
-            category.question_set.all().distinct().count()
-            for category in obj.categories.all()
-        )
-
-    def get_percentage(self, obj):
-        max_score = self.get_max_score(obj)
-        return round((obj.score / max_score) * 100, 2) if max_score else 0
-
-    def get_passed(self, obj):
-        passing_percentage = getattr(obj.test, "passing_percentage", 40)
-        return self.get_percentage(obj) >= passing_percentage
+    def to_representation(self, obj):
+        # Ongoing attempts have no stored summary yet
+        if obj.max_score is None:
+            obj.summarize()
+        if "rank" in self.fields:
+            obj.standing = attempt_standing(obj.test_id, obj.score, obj.status)
+        return super().to_representation(obj)
 
     def get_time_taken(self, obj):
-        if not obj.completed_at:
-            return None
-        delta = obj.completed_at - obj.started_at
-        minutes, seconds = divmod(int(delta.total_seconds()), 60)
-        return f"{minutes} min {seconds} sec"
+        return obj.time_taken()
 
     def get_test_name(self, obj):
         return getattr(obj.test, 'name', None)
@@ -438,59 +423,128 @@ class TestResultSerializer(serializers.ModelSerializer):
     
 
 
-class AdminTestResultSerializer(serializers.ModelSerializer):
-    user = serializers.CharField(source="user.username")
+class AttemptHistorySerializer(serializers.ModelSerializer):
     test_name = serializers.CharField(source="test.name")
-    max_score = serializers.SerializerMethodField()
-    percentage = serializers.SerializerMethodField()
-    passed = serializers.SerializerMethodField()
-    time_taken = serializers.SerializerMethodField()
 
     class Meta:
         model = TestAttempt
         fields = [
             "id",
-            "user",
+            "test",
             "test_name",
+            "status",
             "score",
             "max_score",
             "percentage",
-            "status",
             "passed",
-            "time_taken",
+            "time_taken_seconds",
             "started_at",
             "completed_at",
         ]
 
-    def get_max_score(self, obj):
-        return sum(category.question_set.count() for category in obj.categories.all())
 
-    def get_percentage(self, obj):
-        max_score = self.get_max_score(obj)
-        return round((obj.score / max_score) * 100, 2) if max_score else 0
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    user = serializers.CharField(source="user.username")
+    rank = serializers.SerializerMethodField()
 
-    def get_passed(self, obj):
-        return obj.calculate_pass_fail()["passed"]
+    class Meta:
+        model = TestAttempt
+        fields = [
+            "id",
+            "rank",
+            "user",
+            "score",
+            "percentage",
+            "time_taken_seconds",
+            "completed_at",
+        ]
 
-    def get_time_taken(self, obj):
-        if not obj.completed_at:
-            return None
-        total_seconds = int((obj.completed_at - obj.started_at).total_seconds())
-        minutes, seconds = divmod(total_seconds, 60)
-        return f"{minutes} min {seconds} sec"
+    def get_rank(self, obj):
+        distribution = self.context.get("distribution")
+        return distribution.rank(obj.score) if distribution is not None else None
 
-    
-    
 
+class AdminTestResultSerializer(serializers.ModelSerializer):
+    user = serializers.CharField(source="user.username")
+    test_name = serializers.CharField(source="test.name")
+    time_taken = serializers.SerializerMethodField()
 
+    class Meta:
+        model = TestAttempt
+        fields = [
+            "id",
+            "user",
+            "test_name",
+            "score",
+            "max_score",
+            "percentage",
+            "status",
+            "passed",
+            "time_taken",
+            "started_at",
+            "completed_at",
+        ]
 
+    # Completed attempts carry their summary columns, nothing is computed per row
+    def get_time_taken(self, obj):
+        return obj.time_taken()
 
 
+class ExportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
 
+    class Meta:
+        model = ExportJob
+        fields = [
+            "id",
+            "kind",
+            "params",
+            "status",
+            "rows_done",
+            "rows_total",
+            "progress",
+            "file_size",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "download_url",
+        ]
 
+    def get_progress(self, obj):
+        if obj.status == "DONE":
+            return 100
+        if not obj.rows_total:
+            return 0
+        return round(obj.rows_done / obj.rows_total * 100, 1)
 
+    def get_download_url(self, obj):
+        if obj.status != "DONE":
+            return None
+        return reverse("admin_export_download", args=[obj.id])
 
 
+class ItemStatisticsSerializer(serializers.ModelSerializer):
+    question_text = serializers.CharField(source="question.question_text", read_only=True)
+    correct_option = serializers.CharField(source="question.correct_option", read_only=True)
+    option_rates = serializers.SerializerMethodField()
 
+    class Meta:
+        model = ItemStatistics
+        fields = [
+            "question",
+            "question_text",
+            "correct_option",
+            "presented",
+            "correct",
+            "blank",
+            "p_value",
+            "point_biserial",
+            "option_rates",
+            "updated_at",
+        ]
 
+    def get_option_rates(self, obj):
+        return obj.option_rates()
 
@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .catalogue import bump_catalogue
+from .models import Question, Test
+from .papers import discard_papers_for_category
+from .question_pool import invalidate_category
+
+
+@receiver(pre_save, sender=Question)
+def remember_previous_state(sender, instance, **kwargs):
+    # A question moved to another category must leave the old pool as well
+    instance._previous_state = None
+    if instance.pk:
+        instance._previous_state = (
+            Question.objects.filter(pk=instance.pk)
+            .values_list("question_category_id", "is_active")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Question)
+def invalidate_pool_on_save(sender, instance, **kwargs):
+    invalidate_category(instance.question_category_id)
+
+    previous = getattr(instance, "_previous_state", None)
+    if previous is None:
+        return
+    previous_category_id, was_active = previous
+    if previous_category_id != instance.question_category_id:
+        invalidate_category(previous_category_id)
+    # Pre-generated papers must not hand out a question that left the pool
+    if was_active and (
+        not instance.is_active or previous_category_id != instance.question_category_id
+    ):
+        discard_papers_for_category(previous_category_id)
+
+
+@receiver(post_delete, sender=Question)
+def invalidate_pool_on_delete(sender, instance, **kwargs):
+    invalidate_category(instance.question_category_id)
+    discard_papers_for_category(instance.question_category_id)
+
+
+@receiver(post_save, sender=Test)
+@receiver(post_delete, sender=Test)
+def invalidate_catalogue(sender, instance, **kwargs):
+    # Publishing and unpublishing both save the test
+    bump_catalogue()
+
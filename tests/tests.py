@@ -1,3 +1,1023 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import tarfile
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+
+from . import answer_buffer
+from .answers import record_answer, score_attempt, store_answers
+from .assembly import assemble_attempt
+from .models import (
+    AnswerSheet,
+    AttemptCategory,
+    AttemptResult,
+    ExportJob,
+    ItemStatistics,
+    Question,
+    QuestionCategory,
+    QuestionPaper,
+    QuestionPoolSnapshot,
+    ScoreDistribution,
+    Test,
+    TestAttempt,
+    TestCategoryConfig,
+    UserAnswer,
+)
+from .item_analysis import analyze_batch, analyze_test, pending_attempts
+from .papers import paper_pool_depth, refill_papers
+from .question_pool import get_active_question_ids, invalidate_category, sample_question_ids
+from .attempt_context import get_attempt_context
+from .completion import complete_attempts, sweep_expired_attempts
+from .results import render_result
+from .deadline import issue_deadline_token
+from .export_jobs import job_path, submit_export
+from .exports import RESULTS_HEADER, attempt_rows, csv_chunks
+from .views import (
+    AdminExportJobDownloadAPIView,
+    AdminExportJobsAPIView,
+    AdminTestResultsAPIView,
+    AdminTestResultsCSVExportAPIView,
+    AdminTestViewSet,
+    AttemptHeartbeatAPIView,
+    AttemptHistoryAPIView,
+    DashboardSummaryAPIView,
+    SubmitAnswerAPIView,
+    SubmitAnswersBatchAPIView,
+    SubmitTestAPIView,
+    TestCatalogueAPIView,
+    TestLeaderboardAPIView,
+    TestResultAPIView,
+)
+
+
+def make_test(categories, questions_per_category, picked_per_category):
+    test = Test.objects.create(
+        name=f"Test {categories}x{questions_per_category}",
+        duration=30,
+        max_questions=categories * picked_per_category,
+        total_marks=categories * picked_per_category,
+        passing_marks=1,
+        status="PUBLISHED",
+    )
+    for index in range(categories):
+        category = QuestionCategory.objects.create(name=f"{test.name} cat {index}")
+        Question.objects.bulk_create(
+            Question(
+                question_category=category,
+                question_text=f"Q{number}",
+                option_a="a", option_b="b", option_c="c", option_d="d",
+                correct_option="A",
+            )
+            for number in range(questions_per_category)
+        )
+        TestCategoryConfig.objects.create(
+            test=test, category=category, number_of_questions=picked_per_category
+        )
+        # bulk_create skips the save signals, so refresh the pool by hand and
+        # warm it so only assembly queries are counted
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            invalidate_category(category.id)
+        get_active_question_ids(category.id)
+    return test
+
+
+class QuestionPoolInvalidationTests(TestCase):
+    def pool(self, category_id):
+        return set(sample_question_ids(category_id, 100))
+
+    def test_question_changes_reach_the_pool_once_committed(self):
+        test = make_test(categories=2, questions_per_category=3, picked_per_category=3)
+        first, second = test.category_configs.order_by("id").values_list("category_id", flat=True)
+        question = Question.objects.filter(question_category_id=first).first()
+
+        question.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+            self.assertIn(question.id, self.pool(first))
+        self.assertNotIn(question.id, self.pool(first))
+
+        question.is_active = True
+        question.question_category_id = second
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+        self.assertNotIn(question.id, self.pool(first))
+        self.assertIn(question.id, self.pool(second))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added = Question.objects.create(
+                question_category_id=first, question_text="New",
+                option_a="a", option_b="b", option_c="c", option_d="d", correct_option="B",
+            )
+        self.assertIn(added.id, self.pool(first))
+
+
+class AttemptAssemblyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="candidate", email="candidate@example.com", password="x"
+        )
+
+    def count_start_queries(self, test):
+        with CaptureQueriesContext(connection) as ctx:
+            attempt = assemble_attempt(self.user, test)
+        return attempt, len(ctx.captured_queries)
+
+    def test_assembles_every_category_and_question(self):
+        test = make_test(categories=3, questions_per_category=8, picked_per_category=5)
+        attempt, _ = self.count_start_queries(test)
+
+        categories = AttemptCategory.objects.filter(attempt=attempt)
+        self.assertEqual(categories.count(), 3)
+        for category in categories:
+            self.assertEqual(category.question_set.count(), 5)
+
+    def test_start_cost_is_constant_in_round_trips(self):
+        small = make_test(categories=1, questions_per_category=2, picked_per_category=1)
+        large = make_test(categories=12, questions_per_category=60, picked_per_category=40)
+
+        _, small_queries = self.count_start_queries(small)
+        _, large_queries = self.count_start_queries(large)
+
+        self.assertEqual(small_queries, large_queries)
+        self.assertLessEqual(large_queries, 7)
+
+
+class QuestionPaperPoolTests(TestCase):
+    def test_start_claims_pre_generated_paper(self):
+        user = User.objects.create_user(username="c", email="c@example.com", password="x")
+        test = make_test(categories=2, questions_per_category=6, picked_per_category=3)
+        test.paper_pool_size = 2
+        test.save()
+        # Pool depth, category configs and one insert, whatever the number of papers
+        with self.assertNumQueries(3):
+            refill_papers(test)
+
+        attempt = assemble_attempt(user, test)
+
+        paper = QuestionPaper.objects.get(attempt=attempt)
+        for category_id, question_ids in paper.layout:
+            category = attempt.categories.get(category_id=category_id)
+            self.assertCountEqual(
+                category.question_set.values_list("id", flat=True), question_ids
+            )
+        self.assertEqual(paper_pool_depth(test.id), 1)
+
+
+class SeededAttemptTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="s", email="s@example.com", password="x")
+
+    @override_settings(ATTEMPT_QUESTION_STORAGE="seed")
+    def test_seeded_attempt_rederives_same_questions(self):
+        test = make_test(categories=2, questions_per_category=10, picked_per_category=4)
+        attempt = assemble_attempt(self.user, test)
+
+        through = AttemptCategory.question_set.through
+        self.assertFalse(through.objects.filter(attemptcategory__attempt=attempt).exists())
+        self.assertEqual(len(attempt.question_ids), 8)
+
+        reloaded = TestAttempt.objects.get(pk=attempt.pk)
+        self.assertEqual(reloaded.question_layout, attempt.question_layout)
+
+    def test_compact_command_keeps_row_stored_questions(self):
+        test = make_test(categories=2, questions_per_category=10, picked_per_category=4)
+        attempts = [assemble_attempt(self.user, test) for _ in range(3)]
+        layouts = {
+            attempt.pk: TestAttempt.objects.get(pk=attempt.pk).question_layout for attempt in attempts
+        }
+
+        call_command("compact_attempt_questions", stdout=StringIO())
+
+        for attempt in attempts:
+            converted = TestAttempt.objects.get(pk=attempt.pk)
+            self.assertIsNotNone(converted.question_seed)
+            self.assertEqual(converted.question_layout, layouts[attempt.pk])
+        distinct = {
+            tuple((category_id, tuple(sorted(ids))) for category_id, ids in layout)
+            for layout in layouts.values()
+        }
+        self.assertEqual(QuestionPoolSnapshot.objects.filter(test=test).count(), len(distinct))
+
+
+class AnswerSheetTests(TestCase):
+    def test_sheet_and_rows_agree(self):
+        user = User.objects.create_user(username="p", email="p@example.com", password="x")
+        test = make_test(categories=2, questions_per_category=7, picked_per_category=5)
+        Question.objects.filter(id__in=Question.objects.values("id")[:4]).update(marks=3)
+
+        row_attempt = assemble_attempt(user, test)
+        with override_settings(ANSWER_STORAGE="sheet"):
+            sheet_attempt = assemble_attempt(user, test)
+        self.assertTrue(sheet_attempt.uses_answer_sheet)
+
+        for attempt in (row_attempt, sheet_attempt):
+            for index, question_id in enumerate(attempt.question_order):
+                question = Question.objects.get(pk=question_id)
+                option = question.correct_option if index % 2 else "ABCD"[index % 4]
+                record_answer(attempt, question, option)
+            # answering again overwrites in place
+            record_answer(attempt, question, question.correct_option)
+
+        for attempt in (row_attempt, sheet_attempt):
+            fresh = TestAttempt.objects.get(pk=attempt.pk)
+            questions = Question.objects.in_bulk(fresh.question_ids)
+            expected = sum(
+                questions[qid].marks
+                for qid, option in fresh.selected_options.items()
+                if option == questions[qid].correct_option
+            )
+            self.assertEqual(len(fresh.selected_options), 10)
+            self.assertEqual(score_attempt(fresh), expected)
+            self.assertEqual(fresh.score, expected)
+            self.assertEqual(fresh.answered_count, 10)
+        self.assertEqual(AnswerSheet.objects.count(), 1)
+
+
+class RunningCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="r", email="r@example.com", password="x")
+        self.test = make_test(categories=1, questions_per_category=6, picked_per_category=4)
+
+    def answer_all(self, attempt):
+        questions = Question.objects.in_bulk(attempt.question_ids)
+        for index, question_id in enumerate(attempt.question_order):
+            question = questions[question_id]
+            wrong = "A" if question.correct_option != "A" else "B"
+            record_answer(attempt, question, wrong)
+            if index % 2:
+                record_answer(attempt, question, question.correct_option)
+        return sum(questions[qid].marks for qid in attempt.question_order[1::2])
+
+    def test_counters_follow_changed_answers(self):
+        attempt = assemble_attempt(self.user, self.test)
+        expected = self.answer_all(attempt)
+        attempt.refresh_from_db()
+        self.assertEqual((attempt.answered_count, attempt.correct_count, attempt.score), (4, 2, expected))
+
+    @skipUnless(connection.vendor == "postgresql", "write_answer_rows is the PostgreSQL write path")
+    def test_single_statement_write_moves_counters_by_its_delta(self):
+        attempt = assemble_attempt(self.user, self.test)
+        first, second, third = attempt.question_order[:3]
+        Question.objects.filter(pk=first).update(marks=3)
+
+        def store(*answers):
+            # (question_id, selected_option, marks); make_test keys every question "A"
+            with self.assertNumQueries(4):  # savepoint, attempt lock, combined write, release
+                self.assertTrue(store_answers(
+                    attempt.id, [(qid, option, "A", marks) for qid, option, marks in answers]
+                ))
+            attempt.refresh_from_db()
+            return attempt.answered_count, attempt.correct_count, attempt.score
+
+        # New answers, one right and one wrong
+        self.assertEqual(store((first, "A", 3), (second, "B", 1)), (2, 1, 3))
+        # Right to wrong, wrong to right, a new one, and an unchanged one in a single write
+        self.assertEqual(store((first, "C", 3), (second, "A", 1), (third, "A", 1), (first, "C", 3)), (3, 2, 2))
+        self.assertEqual(store((second, "A", 1)), (3, 2, 2))
+        self.assertEqual(
+            dict(attempt.answers.values_list("question_id", "selected_option")),
+            {first: "C", second: "A", third: "A"},
+        )
+        self.assertEqual(score_attempt(attempt), attempt.score)
+
+    def test_completed_attempt_rejects_answers(self):
+        attempt = assemble_attempt(self.user, self.test)
+        TestAttempt.objects.filter(pk=attempt.pk).update(status="COMPLETED")
+        question = Question.objects.get(pk=attempt.question_order[0])
+        record_answer(attempt, question, question.correct_option)
+        self.assertFalse(attempt.answers.exists())
+        self.assertEqual(TestAttempt.objects.get(pk=attempt.pk).score, 0)
+
+    def test_checker_repairs_drifted_counters(self):
+        with override_settings(ANSWER_STORAGE="sheet"):
+            sheet_attempt = assemble_attempt(self.user, self.test)
+        row_attempt = assemble_attempt(self.user, self.test)
+        expected = [self.answer_all(attempt) for attempt in (row_attempt, sheet_attempt)]
+        TestAttempt.objects.update(answered_count=0, correct_count=0, score=99)
+
+        call_command("check_attempt_counters", "--fix", stdout=StringIO())
+
+        for attempt, score in zip((row_attempt, sheet_attempt), expected):
+            attempt.refresh_from_db()
+            self.assertEqual((attempt.answered_count, attempt.correct_count, attempt.score), (4, 2, score))
+
+
+class SubmitAnswerQueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="q", email="q@example.com", password="x")
+        self.attempt = assemble_attempt(
+            self.user, make_test(categories=2, questions_per_category=6, picked_per_category=3)
+        )
+        self.factory = APIRequestFactory()
+
+    def submit(self, question_id, option):
+        request = self.factory.post(
+            "/api/attempts/submit-answer/",
+            {"attempt": self.attempt.id, "question": question_id, "selected_option": option},
+            format="json",
+        )
+        force_authenticate(request, user=self.user)
+        return SubmitAnswerAPIView.as_view()(request)
+
+    # Savepoint, attempt lock, write, release. On PostgreSQL the write is one
+    # statement (previous answers, upsert and counter update); the lock has to
+    # come first so that statement's snapshot holds every earlier save. Other
+    # backends read, upsert and update separately.
+    WRITE_QUERIES = 4 if connection.vendor == "postgresql" else 6
+
+    def test_answer_save_needs_no_reads_once_context_is_cached(self):
+        first, second = self.attempt.question_order[:2]
+        self.assertEqual(self.submit(first, "A").status_code, 200)
+
+        with self.assertNumQueries(self.WRITE_QUERIES):
+            response = self.submit(second, "B")
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(self.WRITE_QUERIES):
+            self.submit(second, "C")
+        self.assertEqual(
+            UserAnswer.objects.get(attempt=self.attempt, question_id=second).selected_option, "C"
+        )
+
+    def test_foreign_question_is_rejected(self):
+        other = Question.objects.exclude(id__in=self.attempt.question_ids).first()
+        self.assertEqual(self.submit(other.id, "A").status_code, 400)
+
+    def test_batch_saves_all_valid_answers_with_one_write(self):
+        order = self.attempt.question_order
+        other = Question.objects.exclude(id__in=self.attempt.question_ids).first()
+        answers = [{"question": qid, "selected_option": "A"} for qid in order]
+        answers += [
+            {"question": order[0], "selected_option": "D"},
+            {"question": other.id, "selected_option": "A"},
+            {"question": order[1], "selected_option": "Z"},
+        ]
+        get_attempt_context(self.attempt.id)
+
+        request = self.factory.post(
+            "/api/attempts/submit-answers/",
+            {"attempt": self.attempt.id, "answers": answers},
+            format="json",
+        )
+        force_authenticate(request, user=self.user)
+        with self.assertNumQueries(self.WRITE_QUERIES):
+            response = SubmitAnswersBatchAPIView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["saved"] for r in response.data["results"][-3:]], [True, False, False])
+        self.assertEqual(self.attempt.answers.count(), len(order))
+        self.assertEqual(self.attempt.answers.get(question_id=order[0]).selected_option, "D")
+
+
+class WriteBehindTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = override_settings(
+            ANSWER_WRITE_BEHIND=True,
+            ANSWER_BUFFER_OPTIONS={"path": os.path.join(self.tmp.name, "buffer.sqlite3")},
+        )
+        self.settings.enable()
+        answer_buffer._buffer = None
+        self.user = User.objects.create_user(username="w", email="w@example.com", password="x")
+        self.attempt = assemble_attempt(
+            self.user, make_test(categories=1, questions_per_category=5, picked_per_category=4)
+        )
+        self.factory = APIRequestFactory()
+
+    def tearDown(self):
+        answer_buffer._buffer = None
+        self.settings.disable()
+        self.tmp.cleanup()
+
+    def post(self, view, path, data=None, **kwargs):
+        request = self.factory.post(path, data or {}, format="json")
+        force_authenticate(request, user=self.user)
+        return view.as_view()(request, **kwargs)
+
+    def test_buffered_answers_are_flushed_before_scoring(self):
+        questions = Question.objects.in_bulk(self.attempt.question_ids)
+        first, second = self.attempt.question_order[:2]
+        wrong = "A" if questions[first].correct_option != "A" else "B"
+        answers = [
+            {"question": first, "selected_option": wrong},
+            {"question": second, "selected_option": questions[second].correct_option},
+        ]
+        self.post(SubmitAnswersBatchAPIView, "/", {"attempt": self.attempt.id, "answers": answers})
+        self.post(SubmitAnswerAPIView, "/", {
+            "attempt": self.attempt.id, "question": first,
+            "selected_option": questions[first].correct_option,
+        })
+        self.assertFalse(self.attempt.answers.exists())
+
+        response = self.post(SubmitTestAPIView, "/", attempt_id=self.attempt.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.attempt.answers.count(), 2)
+        self.assertEqual(
+            response.data["score"], questions[first].marks + questions[second].marks
+        )
+
+    def test_appends_do_not_wait_for_a_flush(self):
+        question_id = self.attempt.question_order[0]
+        buffer = answer_buffer.get_answer_buffer()
+        buffer.append(self.attempt.id, [(question_id, "A", "A", 1)])
+
+        def handler(entries):
+            # A web worker with no patience for locks appends mid-flush
+            late = sqlite3.connect(buffer.path, timeout=0, isolation_level=None)
+            late.execute(
+                "INSERT INTO buffered_answer (attempt_id, question_id, selected_option, correct_option, marks)"
+                " VALUES (?, ?, 'B', 'A', 1)",
+                (self.attempt.id, question_id),
+            )
+            late.close()
+            answer_buffer.write_buffered(entries)
+
+        self.assertEqual(buffer.drain(handler), 1)
+        self.assertEqual(buffer.drain(answer_buffer.write_buffered), 1)
+        self.assertEqual(self.attempt.answers.get().selected_option, "B")
+
+    def test_answers_of_a_completed_attempt_are_not_reported_saved(self):
+        # Completed by another process whose cached context this one has not seen
+        complete_attempts([self.attempt.id])
+        answer = (self.attempt.question_order[0], "A", "A", 1)
+        self.assertFalse(answer_buffer.save_answers(self.attempt.id, [answer]))
+        self.assertEqual(answer_buffer.flush_buffer(), 0)
+
+
+class ResultDocumentTests(TestCase):
+    def test_result_is_stored_at_submission_and_served_with_one_query(self):
+        cache.clear()
+        user = User.objects.create_user(username="d", email="d@example.com", password="x")
+        attempt = assemble_attempt(
+            user, make_test(categories=2, questions_per_category=4, picked_per_category=2)
+        )
+        # Scores and max_score are in marks, not questions
+        Question.objects.filter(pk=attempt.question_order[0]).update(marks=3)
+        question = Question.objects.get(pk=attempt.question_order[0])
+        record_answer(attempt, question, question.correct_option)
+        factory = APIRequestFactory()
+
+        request = factory.post("/", {}, format="json")
+        force_authenticate(request, user=user)
+        SubmitTestAPIView.as_view()(request, attempt_id=attempt.id)
+        self.assertTrue(AttemptResult.objects.filter(attempt=attempt).exists())
+
+        request = factory.get("/")
+        force_authenticate(request, user=user)
+        with self.assertNumQueries(1):
+            response = TestResultAPIView.as_view()(request, attempt_id=attempt.id)
+        result = json.loads(response.content)
+        self.assertEqual((result["id"], result["score"], result["status"]), (attempt.id, 3, "COMPLETED"))
+        self.assertEqual(len(result["categories"]), 2)
+        self.assertEqual((result["max_score"], result["percentage"], result["passed"]), (6, 50.0, True))
+        self.assertEqual((result["rank"], result["percentile"]), (1, None))
+
+    def test_summary_backfill(self):
+        user = User.objects.create_user(username="b", email="b@example.com", password="x")
+        attempt = assemble_attempt(
+            user, make_test(categories=1, questions_per_category=4, picked_per_category=4)
+        )
+        started = attempt.started_at
+        TestAttempt.objects.filter(pk=attempt.pk).update(
+            status="COMPLETED", score=2, completed_at=started + timedelta(seconds=125)
+        )
+        Question.objects.filter(pk=attempt.question_order[0]).update(marks=4)
+
+        call_command("backfill_result_summaries", stdout=StringIO())
+
+        attempt.refresh_from_db()
+        self.assertEqual(
+            (attempt.max_score, attempt.percentage, attempt.passed, attempt.time_taken()),
+            (7, 28.57, True, "2 min 5 sec"),
+        )
+
+
+class ExpiredAttemptSweepTests(TestCase):
+    def test_sweep_completes_only_expired_attempts_with_their_score(self):
+        user = User.objects.create_user(username="s", email="s@example.com", password="x")
+        test = make_test(categories=1, questions_per_category=4, picked_per_category=3)
+        expired, running = assemble_attempt(user, test), assemble_attempt(user, test)
+        question = Question.objects.get(pk=expired.question_order[0])
+        record_answer(expired, question, question.correct_option)
+        deadline = timezone.now() - timedelta(minutes=1)
+        TestAttempt.objects.filter(pk=expired.pk).update(ends_at=deadline)
+
+        output = StringIO()
+        call_command("sweep_expired_attempts", "--batch-size", "1", stdout=output)
+
+        expired.refresh_from_db()
+        running.refresh_from_db()
+        self.assertIn("Completed 1 expired attempts", output.getvalue())
+        self.assertEqual((expired.status, expired.score), ("COMPLETED", question.marks))
+        self.assertEqual(expired.completed_at, deadline)
+        self.assertFalse(running.is_time_over())
+        self.assertEqual(running.status, "ONGOING")
+
+    def test_sweep_queries_do_not_grow_with_the_batch(self):
+        user = User.objects.create_user(username="q", email="q@example.com", password="x")
+        test = make_test(categories=2, questions_per_category=4, picked_per_category=2)
+        deadline = timezone.now() - timedelta(minutes=1)
+
+        def sweep(count):
+            attempts = [assemble_attempt(user, test) for _ in range(count)]
+            for attempt in attempts:
+                question = Question.objects.get(pk=attempt.question_order[0])
+                record_answer(attempt, question, question.correct_option)
+            TestAttempt.objects.filter(pk__in=[a.pk for a in attempts]).update(ends_at=deadline)
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(sweep_expired_attempts()["completed"], count)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(sweep(2), sweep(10))
+        self.assertEqual(AttemptResult.objects.filter(attempt__test=test).count(), 12)
+        stored = AttemptResult.objects.filter(attempt__test=test).first()
+        self.assertEqual(stored.document, render_result(TestAttempt.objects.get(pk=stored.attempt_id)))
+
+
+class DeadlineTokenTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="h", email="h@example.com", password="x")
+        self.attempt = assemble_attempt(
+            user, make_test(categories=1, questions_per_category=3, picked_per_category=2)
+        )
+        self.factory = APIRequestFactory()
+
+    def heartbeat(self, token):
+        request = self.factory.get("/api/attempts/heartbeat/", {"token": token})
+        return AttemptHeartbeatAPIView.as_view()(request)
+
+    def test_heartbeat_reads_only_the_token(self):
+        token = issue_deadline_token(self.attempt)
+        with self.assertNumQueries(0):
+            response = self.heartbeat(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["attempt_id"], self.attempt.id)
+        self.assertAlmostEqual(response.data["remaining_seconds"], 30 * 60, delta=5)
+
+    def test_tampered_token_is_rejected(self):
+        token = issue_deadline_token(self.attempt)
+        self.assertEqual(self.heartbeat(token[:-1] + ("A" if token[-1] != "A" else "B")).status_code, 400)
+
+
+class AdminResultsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username="admin", email="admin@example.com", password="x")
+        User.objects.filter(pk=self.admin.pk).update(is_admin=True, is_staff=True)
+        self.admin.refresh_from_db()
+        user = User.objects.create_user(username="c", email="c@example.com", password="x")
+        test = make_test(categories=1, questions_per_category=3, picked_per_category=2)
+        finished = timezone.now()
+        self.attempts = []
+        for score in range(5):
+            attempt = assemble_attempt(user, test)
+            TestAttempt.objects.filter(pk=attempt.pk).update(
+                status="COMPLETED", score=score, passed=score >= 2,
+                # two attempts share a timestamp so the id tie-break is exercised
+                completed_at=finished - timedelta(minutes=min(score, 3)),
+            )
+            self.attempts.append(attempt.pk)
+        self.factory = APIRequestFactory()
+
+    def get(self, params):
+        request = self.factory.get("/api/admin/results/", params)
+        force_authenticate(request, user=self.admin)
+        return AdminTestResultsAPIView.as_view()(request)
+
+    def test_keyset_pages_cover_every_row_once(self):
+        seen = []
+        params = {"page_size": 2}
+        while True:
+            response = self.get(params)
+            self.assertEqual(response.status_code, 200)
+            seen += [row["id"] for row in response.data["results"]]
+            if not response.data["next"]:
+                break
+            params["cursor"] = parse_qs(urlparse(response.data["next"]).query)["cursor"][0]
+        self.assertEqual(sorted(seen), sorted(self.attempts))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_filters_run_in_sql(self):
+        response = self.get({"result": "pass", "score_max": 3})
+        self.assertEqual(sorted(row["score"] for row in response.data["results"]), [2, 3])
+        self.assertEqual(self.get({"score_min": "x"}).status_code, 400)
+
+    def test_export_streams_filtered_rows(self):
+        request = self.factory.get("/api/admin/results/export/", {"result": "fail"})
+        force_authenticate(request, user=self.admin)
+        response = AdminTestResultsCSVExportAPIView.as_view()(request)
+
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][:4], ["ID", "User", "Test", "Score"])
+        self.assertEqual(sorted(int(row[3]) for row in rows[1:]), [0, 1])
+        self.assertTrue(all(row[4] == "2" and row[7] == "FAIL" for row in rows[1:]))
+
+    def test_export_job_is_deduplicated_written_and_downloadable_by_range(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(EXPORT_ROOT=root):
+            def submit():
+                request = self.factory.post(
+                    "/api/admin/exports/", {"kind": "results", "params": {"result": "pass"}}, format="json"
+                )
+                force_authenticate(request, user=self.admin)
+                return AdminExportJobsAPIView.as_view()(request)
+
+            first, second = submit(), submit()
+            self.assertEqual((first.status_code, second.status_code), (201, 200))
+            self.assertEqual(first.data["id"], second.data["id"])
+
+            call_command("run_export_jobs", stdout=StringIO())
+            job = ExportJob.objects.get(pk=first.data["id"])
+            self.assertEqual((job.status, job.rows_done), ("DONE", 3))
+
+            request = self.factory.get("/", HTTP_RANGE="bytes=0-9")
+            force_authenticate(request, user=self.admin)
+            response = AdminExportJobDownloadAPIView.as_view()(request, job_id=job.id)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response["Content-Range"], f"bytes 0-9/{job.file_size}")
+
+            request = self.factory.get("/")
+            force_authenticate(request, user=self.admin)
+            response = AdminExportJobDownloadAPIView.as_view()(request, job_id=job.id)
+            rows = list(csv.reader(StringIO(gzip.decompress(b"".join(response.streaming_content)).decode())))
+            self.assertEqual(len(rows), 4)
+            self.assertEqual(submit().status_code, 201)
+
+            test_id = TestAttempt.objects.get(pk=self.attempts[0]).test_id
+            bundle, _ = submit_export(self.admin, "test_bundle", {"test": test_id})
+            same, created = submit_export(self.admin, "test_bundle", {"test": str(test_id)})
+            self.assertEqual((same.id, created), (bundle.id, False))
+            with self.assertRaises(ValidationError):
+                submit_export(self.admin, "test_bundle", {"test": [test_id]})
+            call_command("run_export_jobs", stdout=StringIO())
+            bundle.refresh_from_db()
+            with tarfile.open(job_path(bundle)) as archive:
+                self.assertEqual(len(archive.getnames()), len(self.attempts))
+
+    def test_abandoned_running_job_no_longer_blocks_identical_exports(self):
+        test_id = TestAttempt.objects.get(pk=self.attempts[0]).test_id
+        job, _ = submit_export(self.admin, "test_bundle", {"test": test_id})
+        silent = timezone.now() - timedelta(hours=1)
+        ExportJob.objects.filter(pk=job.pk).update(status="RUNNING", started_at=silent, progress_at=silent)
+
+        retry, created = submit_export(self.admin, "test_bundle", {"test": test_id})
+
+        self.assertTrue(created)
+        self.assertNotEqual(retry.pk, job.pk)
+        self.assertEqual(ExportJob.objects.get(pk=job.pk).status, "FAILED")
+
+
+class TestArchiveTests(TestCase):
+    def test_archive_matches_single_attempt_exports(self):
+        user = User.objects.create_user(username="z", email="z@example.com", password="x")
+        test = make_test(categories=2, questions_per_category=4, picked_per_category=2)
+        with override_settings(ANSWER_STORAGE="sheet"):
+            sheet_attempt = assemble_attempt(user, test)
+        attempts = [assemble_attempt(user, test), sheet_attempt]
+        for attempt in attempts:
+            question = Question.objects.get(pk=attempt.question_order[1])
+            record_answer(attempt, question, "B")
+
+        for workers in (1, 2):
+            with tempfile.TemporaryDirectory() as root:
+                path = os.path.join(root, "archive.zip")
+                call_command("export_test_archive", test.id, "--output", path,
+                             "--workers", str(workers), stdout=StringIO())
+                with zipfile.ZipFile(path) as archive:
+                    for attempt in attempts:
+                        expected = "".join(csv_chunks(
+                            RESULTS_HEADER, attempt_rows(TestAttempt.objects.get(pk=attempt.pk))
+                        ))
+                        self.assertEqual(
+                            archive.read(f"attempt_{attempt.id}.csv").decode(), expected
+                        )
+
+
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        self.test = make_test(categories=1, questions_per_category=4, picked_per_category=3)
+        self.answers = [
+            {0: "A", 1: "A", 2: "A"},
+            {0: "A", 1: "B"},
+            {0: "C", 2: "A"},
+            {1: "A", 2: "D"},
+            {0: "A", 1: "A", 2: "B"},
+        ]
+        self.attempts = []
+        for index, picks in enumerate(self.answers):
+            user = User.objects.create_user(username=f"i{index}", email=f"i{index}@example.com", password="x")
+            with override_settings(ANSWER_STORAGE="sheet" if index % 2 else "rows"):
+                attempt = assemble_attempt(user, self.test)
+            for position, option in picks.items():
+                question = Question.objects.get(pk=attempt.question_order[position])
+                record_answer(attempt, question, option)
+            self.attempts.append(attempt)
+
+    def expected(self):
+        """{question_id: (presented, correct, chose_a, p_value, point_biserial)} computed directly."""
+        from statistics import StatisticsError, correlation
+
+        columns = {}
+        for attempt in self.attempts:
+            attempt = TestAttempt.objects.get(pk=attempt.pk)
+            selected = attempt.selected_options
+            for question_id in attempt.question_order:
+                right = int(selected.get(question_id) == "A")
+                column = columns.setdefault(question_id, ([], [], []))
+                column[0].append(right)
+                column[1].append(attempt.score - right)
+                column[2].append(selected.get(question_id))
+        expected = {}
+        for question_id, (right, rest, options) in columns.items():
+            try:
+                r = correlation(rest, right)
+            except StatisticsError:
+                r = None
+            expected[question_id] = (len(right), sum(right), options.count("A"), sum(right) / len(right), r)
+        return expected
+
+    def analyzed(self):
+        return {
+            stats.question_id: (stats.presented, stats.correct, stats.chose_a, stats.p_value, stats.point_biserial)
+            for stats in ItemStatistics.objects.filter(test=self.test)
+        }
+
+    def assertStatistics(self, expected):
+        analyzed = self.analyzed()
+        self.assertEqual(analyzed.keys(), expected.keys())
+        for question_id, values in expected.items():
+            self.assertEqual(analyzed[question_id][:3], values[:3])
+            for got, want in zip(analyzed[question_id][3:], values[3:]):
+                if want is None:
+                    self.assertIsNone(got)
+                else:
+                    self.assertAlmostEqual(got, want)
+
+    def test_incremental_runs_match_a_full_recompute(self):
+        first, rest = self.attempts[:2], self.attempts[2:]
+        complete_attempts([attempt.id for attempt in first])
+        call_command("analyze_items", "--test", str(self.test.id), stdout=StringIO())
+        self.assertEqual(
+            TestAttempt.objects.filter(test=self.test, item_analyzed=True).count(), 2
+        )
+
+        complete_attempts([attempt.id for attempt in rest])
+        call_command("analyze_items", "--batch-size", "2", stdout=StringIO())
+        self.assertStatistics(self.expected())
+
+        call_command("analyze_items", "--test", str(self.test.id), "--full", stdout=StringIO())
+        self.assertStatistics(self.expected())
+
+    def test_overlapping_run_does_not_merge_attempts_twice(self):
+        complete_attempts([attempt.id for attempt in self.attempts])
+        # A second run loaded the same batch before the first one committed
+        stale = list(pending_attempts(self.test.id))
+        analyze_test(self.test.id)
+
+        self.assertEqual(analyze_batch(self.test.id, stale), 0)
+        self.assertStatistics(self.expected())
+
+
+class ScoreDistributionTests(TestCase):
+    def test_completions_feed_the_admin_score_stats(self):
+        admin = User.objects.create_user(username="admin", email="admin@example.com", password="x")
+        User.objects.filter(pk=admin.pk).update(is_admin=True, is_staff=True)
+        admin.refresh_from_db()
+        test = make_test(categories=1, questions_per_category=4, picked_per_category=4)
+        scores = [0, 1, 1, 2, 3, 4, 4, 4, 4, 4]
+        for index, score in enumerate(scores):
+            user = User.objects.create_user(username=f"s{index}", email=f"s{index}@example.com", password="x")
+            attempt = assemble_attempt(user, test)
+            for question_id in attempt.question_order[:score]:
+                record_answer(attempt, Question.objects.get(pk=question_id), "A")
+            complete_attempts([attempt.id])
+            # Completing twice must not count the attempt twice
+            complete_attempts([attempt.id])
+
+        request = APIRequestFactory().get(f"/api/admin/tests/{test.id}/scores/")
+        force_authenticate(request, user=admin)
+        response = AdminTestViewSet.as_view({"get": "scores"})(request, pk=test.id)
+        expected = {
+            "test": test.id,
+            "count": 10,
+            "mean": 2.7,
+            "min": 0,
+            "max": 4,
+            "median": 3,
+            "p90": 4,
+            "histogram": [
+                {"score": 0, "count": 1},
+                {"score": 1, "count": 2},
+                {"score": 2, "count": 1},
+                {"score": 3, "count": 1},
+                {"score": 4, "count": 5},
+            ],
+        }
+        self.assertEqual(response.data, expected)
+
+        ScoreDistribution.objects.filter(test=test).update(count=0, total=0, histogram=[])
+        call_command("rebuild_score_distributions", stdout=StringIO())
+        self.assertEqual(ScoreDistribution.objects.get(test=test).summary(), {
+            key: value for key, value in expected.items() if key != "test"
+        })
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        test = make_test(categories=1, questions_per_category=4, picked_per_category=4)
+        self.test = test
+        self.users = []
+        self.attempts = []
+        for index, score in enumerate([2, 4, 1, 4, 3, 0]):
+            user = User.objects.create_user(username=f"l{index}", email=f"l{index}@example.com", password="x")
+            attempt = assemble_attempt(user, test)
+            for question_id in attempt.question_order[:score]:
+                record_answer(attempt, Question.objects.get(pk=question_id), "A")
+            complete_attempts([attempt.id])
+            self.users.append(user)
+            self.attempts.append(attempt)
+
+    def get(self, view, user, path="/", **kwargs):
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=user)
+        return view.as_view()(request, **kwargs)
+
+    def test_result_carries_live_rank_and_percentile(self):
+        response = self.get(TestResultAPIView, self.users[0], attempt_id=self.attempts[0].id)
+        result = json.loads(response.content)
+        # Score 2: three attempts scored higher, two of the five others lower
+        self.assertEqual((result["rank"], result["percentile"]), (4, 40.0))
+
+        # A later, lower score moves the stored result's percentile
+        user = User.objects.create_user(username="late", email="late@example.com", password="x")
+        complete_attempts([assemble_attempt(user, self.test).id])
+        response = self.get(TestResultAPIView, self.users[0], attempt_id=self.attempts[0].id)
+        result = json.loads(response.content)
+        self.assertEqual((result["rank"], result["percentile"]), (4, 50.0))
+
+    def test_leaderboard_pages_follow_the_score_order(self):
+        entries = []
+        path = f"/api/tests/{self.test.id}/leaderboard/?page_size=4"
+        while path:
+            response = self.get(TestLeaderboardAPIView, self.users[0], path, test_id=self.test.id)
+            entries.extend(response.data["results"])
+            path = response.data["next"]
+        self.assertEqual(
+            [(entry["rank"], entry["user"], entry["score"]) for entry in entries],
+            [(1, "l1", 4), (1, "l3", 4), (3, "l4", 3), (4, "l0", 2), (5, "l2", 1), (6, "l5", 0)],
+        )
+
+
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="dash", email="dash@example.com", password="x")
+        self.test = make_test(categories=1, questions_per_category=4, picked_per_category=2)
+        for score in range(4):
+            attempt = assemble_attempt(self.user, self.test)
+            for question_id in attempt.question_order[:score % 3]:
+                record_answer(attempt, Question.objects.get(pk=question_id), "A")
+            complete_attempts([attempt.id])
+
+    def summary(self):
+        request = APIRequestFactory().get("/api/dashboard/")
+        force_authenticate(request, user=self.user)
+        return DashboardSummaryAPIView.as_view()(request).data
+
+    def test_summary_is_cached_and_dropped_on_start_and_completion(self):
+        summary = self.summary()
+        self.assertEqual(
+            (summary["total_attempts"], summary["completed"], summary["passed"], summary["best_score"]),
+            (4, 4, 2, 2),
+        )
+        self.assertEqual([entry["score"] for entry in summary["recent"]], [0, 2, 1])
+        self.assertEqual(summary["last_score"], 0)
+        self.assertEqual(summary["recent"][0]["test_name"], self.test.name)
+        with self.assertNumQueries(0):
+            self.summary()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt = assemble_attempt(self.user, self.test)
+        summary = self.summary()
+        self.assertEqual((summary["total_attempts"], [entry["id"] for entry in summary["ongoing"]]), (5, [attempt.id]))
+
+        # An attempt that expires while cached is completed on the next read
+        TestAttempt.objects.filter(pk=attempt.pk).update(ends_at=timezone.now() - timedelta(seconds=1))
+        cache.set(f"dashboard_summary:{self.user.id}", {
+            **summary, "ongoing": [{**summary["ongoing"][0], "ends_at": timezone.now() - timedelta(seconds=1)}],
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            summary = self.summary()
+        self.assertEqual((summary["completed"], summary["ongoing"]), (5, []))
+        self.assertEqual(self.summary()["completed"], 5)
+
+    def test_dashboard_page_renders_from_the_summary(self):
+        session = self.client.session
+        session["user_id"] = self.user.id
+        session.save()
+        response = self.client.get("/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["summary"]["completed"], 4)
+        self.assertContains(response, self.test.name)
+
+
+class AttemptHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="h", email="h@example.com", password="x")
+        test = make_test(categories=1, questions_per_category=3, picked_per_category=2)
+        self.attempts = [assemble_attempt(self.user, test) for _ in range(7)]
+        # Completing an older attempt moves it to the top of the history
+        complete_attempts([self.attempts[1].id])
+        complete_attempts([self.attempts[3].id])
+        self.expected = [
+            self.attempts[3].id, self.attempts[1].id,
+            self.attempts[6].id, self.attempts[5].id, self.attempts[4].id,
+            self.attempts[2].id, self.attempts[0].id,
+        ]
+
+    def test_api_pages_are_keyset_ordered_with_one_query_each(self):
+        seen = []
+        path = "/api/attempts/?page_size=3"
+        while path:
+            request = APIRequestFactory().get(path)
+            force_authenticate(request, user=self.user)
+            with self.assertNumQueries(1):
+                response = AttemptHistoryAPIView.as_view()(request)
+            seen.extend(entry["id"] for entry in response.data["results"])
+            path = response.data["next"]
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(response.data["results"][0]["test_name"], self.attempts[0].test.name)
+
+    def test_history_page_links_to_older_attempts(self):
+        session = self.client.session
+        session["user_id"] = self.user.id
+        session.save()
+        response = self.client.get("/attempted/?page_size=5")
+        self.assertEqual([a.id for a in response.context["attempts"]], self.expected[:5])
+        response = self.client.get(response.context["next_url"])
+        self.assertEqual([a.id for a in response.context["attempts"]], self.expected[5:])
+        self.assertIsNone(response.context["next_url"])
+
+
+class TestCatalogueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="cat", email="cat@example.com", password="x")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test = make_test(categories=1, questions_per_category=3, picked_per_category=2)
+
+    def get(self, **headers):
+        request = APIRequestFactory().get("/api/tests/", **headers)
+        force_authenticate(request, user=self.user)
+        return TestCatalogueAPIView.as_view()(request)
+
+    def test_etag_revalidation_and_publish_invalidation(self):
+        response = self.get()
+        etag = response["ETag"]
+        self.assertEqual([entry["name"] for entry in json.loads(response.content)], [self.test.name])
+
+        with self.assertNumQueries(0):
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        admin = User.objects.create_user(username="cadmin", email="cadmin@example.com", password="x")
+        User.objects.filter(pk=admin.pk).update(is_admin=True, is_staff=True)
+        admin.refresh_from_db()
+        request = APIRequestFactory().post(f"/api/admin/tests/{self.test.id}/unpublish/")
+        force_authenticate(request, user=admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            AdminTestViewSet.as_view({"post": "unpublish"})(request, pk=self.test.id)
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(json.loads(response.content), [])
+
+    def test_dashboard_renders_the_cached_cards(self):
+        session = self.client.session
+        session["user_id"] = self.user.id
+        session.save()
+        self.assertContains(self.client.get("/dashboard/"), f"/start/{self.test.id}/")
 
-# Create your tests here.
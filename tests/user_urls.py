@@ -4,16 +4,28 @@ from .views import (
                     StartTestAPIView,
                     FetchAttemptQuestionsAPIView ,
                     SubmitAnswerAPIView,
+                    SubmitAnswersBatchAPIView,
                     SubmitTestAPIView,
+                    AttemptHeartbeatAPIView,
                     TestResultAPIView,
+                    TestLeaderboardAPIView,
+                    DashboardSummaryAPIView,
+                    TestCatalogueAPIView,
+                    AttemptHistoryAPIView,
                     ExportAttemptCSVAPIView,
                     )
 
 
 urlpatterns = [
+    path("tests/", TestCatalogueAPIView.as_view(), name="test-catalogue"),
+    path("dashboard/", DashboardSummaryAPIView.as_view(), name="api-dashboard"),
+    path("attempts/", AttemptHistoryAPIView.as_view(), name="attempt-history"),
     path("tests/<int:test_id>/start/", StartTestAPIView.as_view(), name="start-test"),
+    path("tests/<int:test_id>/leaderboard/", TestLeaderboardAPIView.as_view(), name="test-leaderboard"),
     path("attempts/<int:attempt_id>/questions/", FetchAttemptQuestionsAPIView.as_view(), name="fetch-attempt-questions"),
     path("attempts/submit-answer/", SubmitAnswerAPIView.as_view(), name="submit-answer"),
+    path("attempts/submit-answers/", SubmitAnswersBatchAPIView.as_view(), name="submit-answers"),
+    path("attempts/heartbeat/", AttemptHeartbeatAPIView.as_view(), name="attempt-heartbeat"),
     path("attempts/<int:attempt_id>/submit/", SubmitTestAPIView.as_view(), name="submit-test"),
     path("attempts/<int:attempt_id>/export/", ExportAttemptCSVAPIView.as_view(), name="export-attempt"),
     path("attempts/<int:attempt_id>/result/", TestResultAPIView.as_view(), name="api-test-result"),
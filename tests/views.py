@@ -3,9 +3,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 
-from .models import Test, TestCategoryConfig , QuestionCategory, Question, TestAttempt, AttemptCategory, UserAnswer
+from .models import Test, TestCategoryConfig , QuestionCategory, Question, TestAttempt
 from .serializers import (
     TestCreateSerializer,
     TestCategoryConfigSerializer,
@@ -17,8 +16,11 @@ from .serializers import (
     AttemptCategoryQuestionSerializer,
     SubmitAnswerSerializer,
     SubmitTestSerializer,
-    TestResultSerializer,
-    AdminTestResultSerializer
+    AdminTestResultSerializer,
+    ExportJobSerializer,
+    ItemStatisticsSerializer,
+    LeaderboardEntrySerializer,
+    AttemptHistorySerializer
 )
 from .permissions import IsAdminUser, IsSystemAdmin , IsNormalUser
 from rest_framework.views import APIView
@@ -27,15 +29,28 @@ from rest_framework.response import Response
 from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
-from django.http import StreamingHttpResponse
-import csv
-import csv
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+import re
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser 
 from django.db.models import Q
-from .models import TestAttempt
-from .pagination import AdminResultsPagination
+from .models import ExportJob, ScoreDistribution, TestAttempt
+from .answer_buffer import save_answers
+from .attempt_context import get_attempt_context
+from .completion import complete_attempt, complete_attempts
+from .catalogue import get_catalogue
+from .dashboard import get_dashboard_summary
+from .history import attempt_history
+from .deadline import issue_deadline_token, read_deadline_token, seconds_left
+from .archive import stream_test_archive
+from .export_jobs import job_path, submit_export
+from .exports import RESULTS_HEADER, attempt_rows, csv_chunks, result_rows, results_export_queryset
+from .filters import filter_admin_results
+from .results import get_result_document
+from .pagination import AdminResultsPagination, AttemptHistoryPagination, LeaderboardPagination
+from .papers import discard_papers, paper_pool_depth
 
 
 
@@ -56,6 +71,7 @@ class AdminTestViewSet(viewsets.ModelViewSet):
 
         test.status = "DRAFT"
         test.save()
+        discard_papers(test.id)
         return Response(
             {"message": "Test moved back to draft"},
             status=status.HTTP_200_OK,
@@ -83,6 +99,44 @@ class AdminTestViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK,
         )
 
+    @action(detail=True, methods=["get"])
+    def archive(self, request, pk=None):
+        """Zip of one CSV per attempt of this test, streamed as it is rendered."""
+        test = self.get_object()
+        response = StreamingHttpResponse(stream_test_archive(test.id), content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="test_{test.id}_attempts.zip"'
+        return response
+
+    @action(detail=True, methods=["get"])
+    def items(self, request, pk=None):
+        """Item statistics of this test's questions (``manage.py analyze_items`` keeps them current)."""
+        test = self.get_object()
+        stats = test.item_statistics.select_related("question").order_by("question_id")
+        return Response({
+            "test": test.id,
+            "pending_attempts": test.attempts.filter(status="COMPLETED", item_analyzed=False).count(),
+            "items": ItemStatisticsSerializer(stats, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"])
+    def scores(self, request, pk=None):
+        """Score distribution of this test's completed attempts, read from one row."""
+        test = self.get_object()
+        distribution = ScoreDistribution.objects.filter(test=test).first() or ScoreDistribution(test=test)
+        return Response({"test": test.id, **distribution.summary()}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"])
+    def papers(self, request, pk=None):
+        """Pre-generated paper pool metrics for a test."""
+        test = self.get_object()
+        available = paper_pool_depth(test.id)
+        return Response({
+            "test": test.id,
+            "pool_size": test.paper_pool_size,
+            "available": available,
+            "claimed": test.papers.filter(attempt__isnull=False).count(),
+        }, status=status.HTTP_200_OK)
+
 
 class AdminTestCategoryConfigViewSet(viewsets.ModelViewSet):
     """
@@ -163,21 +217,41 @@ class StartTestAPIView(APIView):
         serializer.is_valid(raise_exception=True)
         attempt = serializer.save()
 
-        # Use correct related name
-        for config in attempt.test.category_configs.all():  # <-- change here
-            attempt_category = AttemptCategory.objects.create(
-                attempt=attempt,
-                category=config.category
-            )
-            questions = config.category.category_questions.filter(is_active=True)[:config.number_of_questions]
-            attempt_category.question_set.set(questions)
-
         return Response({
             "attempt_id": attempt.id,
+            "ends_at": attempt.ends_at,
+            "deadline_token": issue_deadline_token(attempt),
             "message": "Test started successfully."
         }, status=status.HTTP_201_CREATED)
 
 
+class AttemptHeartbeatAPIView(APIView):
+    """
+    Time left of an attempt, read from its signed deadline token
+    (``?token=...``). The token is the only credential, so this touches
+    neither the database nor the session.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        deadline = read_deadline_token(request.query_params.get("token", ""))
+        if deadline is None:
+            return Response(
+                {"detail": "Invalid deadline token."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        remaining = seconds_left(deadline)
+        minutes, seconds = divmod(remaining, 60)
+        return Response({
+            "attempt_id": deadline["attempt"],
+            "remaining_seconds": remaining,
+            "time_left": f"{minutes} min {seconds} sec",
+            "expired": remaining == 0
+        })
+
+
 
 class FetchAttemptQuestionsAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -193,9 +267,7 @@ class FetchAttemptQuestionsAPIView(APIView):
             )
 
         if attempt.is_time_over():
-            attempt.status = "COMPLETED"
-            attempt.completed_at = timezone.now()
-            attempt.save()
+            complete_attempt(attempt, completed_at=attempt.ends_at)
             return Response(
                 {"detail": "Test time is over."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -207,6 +279,44 @@ class FetchAttemptQuestionsAPIView(APIView):
 
     
     
+def parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def answerable_context(user, attempt_id):
+    """
+    Return ``(context, None)`` when ``user`` may still answer the attempt,
+    otherwise ``(None, error_response)``.
+    """
+    context = get_attempt_context(parse_id(attempt_id))
+    if context is None or context.user_id != user.id:
+        return None, Response(
+            {"detail": "Test attempt not found."},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    # 🔴 Block if already submitted
+    if context.status == "COMPLETED":
+        return None, Response(
+            {"detail": "Test already submitted."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # 🔴 Auto-complete if time over
+    if context.is_time_over():
+        complete_attempts([context.attempt_id], completed_at=context.ends_at)
+
+        return None, Response(
+            {"detail": "Test time is over. Test auto-submitted."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return context, None
+
+
 class SubmitAnswerAPIView(APIView):
     permission_classes = [IsAuthenticated, IsNormalUser]
 
@@ -223,68 +333,133 @@ class SubmitAnswerAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 🔹 Fetch attempt
-        try:
-            attempt = TestAttempt.objects.get(id=attempt_id, user=user)
-        except TestAttempt.DoesNotExist:
+        if selected_option not in ("A", "B", "C", "D"):
             return Response(
-                {"detail": "Test attempt not found."},
-                status=status.HTTP_404_NOT_FOUND
+                {"detail": "selected_option must be one of A, B, C or D."},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 🔴 Block if already submitted
-        if attempt.status == "COMPLETED":
+        # 🔹 Cached attempt context (owner, deadline, questions)
+        context, error = answerable_context(user, attempt_id)
+        if error:
+            return error
+
+        # 🔹 Ensure question belongs to this attempt
+        question_id = parse_id(question_id)
+        if question_id not in context.questions:
+            if not Question.objects.filter(id=question_id, is_active=True).exists():
+                return Response(
+                    {"detail": "Question not found."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(
+                {"detail": "Question does not belong to this test attempt."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 🔹 Save or update answer and move the running score (no query
+        # when answers are buffered)
+        correct_option, marks = context.questions[question_id]
+        is_correct = selected_option == correct_option
+        if not save_answers(
+            context.attempt_id,
+            [(question_id, selected_option, correct_option, marks)],
+            context.order
+        ):
             return Response(
                 {"detail": "Test already submitted."},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        marks_awarded = marks if is_correct else 0
 
-        # 🔴 Auto-complete if time over
-        if attempt.is_time_over():
-            attempt.status = "COMPLETED"
-            attempt.completed_at = timezone.now()
-            attempt.save()
+        return Response({
+            "message": "Answer saved successfully.",
+            "attempt_id": context.attempt_id,
+            "question_id": question_id,
+            "selected_option": selected_option,
+            "is_correct": is_correct,
+            "marks_awarded": marks_awarded,
+            "time_left": context.time_left()
+        }, status=200)
+
+    
+    
+class SubmitAnswersBatchAPIView(APIView):
+    """
+    Save many answers of one attempt in a single request.
+
+    Expects ``{"attempt": id, "answers": [{"question": id, "selected_option": "A"}, ...]}``.
+    Every item is validated against the cached attempt context and all valid
+    ones are written with one bulk upsert; later items for the same
+    question win.
+    """
+    permission_classes = [IsAuthenticated, IsNormalUser]
+    max_answers = 500
 
+    def post(self, request):
+        attempt_id = request.data.get("attempt")
+        answers = request.data.get("answers")
+
+        # 🔹 Validate payload
+        if not attempt_id or not isinstance(answers, list) or not answers:
             return Response(
-                {"detail": "Test time is over. Test auto-submitted."},
+                {"detail": "attempt and a non-empty answers list are required."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        # 🔹 Fetch question
-        try:
-            question = Question.objects.get(id=question_id, is_active=True)
-        except Question.DoesNotExist:
+        if len(answers) > self.max_answers:
             return Response(
-                {"detail": "Question not found."},
-                status=status.HTTP_404_NOT_FOUND
+                {"detail": f"At most {self.max_answers} answers can be sent at once."},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 🔹 Ensure question belongs to this attempt
-        if not attempt.categories.filter(question_set=question).exists():
+        context, error = answerable_context(request.user, attempt_id)
+        if error:
+            return error
+
+        results = []
+        valid = []
+        for item in answers:
+            item = item if isinstance(item, dict) else {}
+            question_id = parse_id(item.get("question"))
+            selected_option = item.get("selected_option")
+
+            if selected_option not in ("A", "B", "C", "D"):
+                detail = "selected_option must be one of A, B, C or D."
+            elif question_id not in context.questions:
+                detail = "Question does not belong to this test attempt."
+            else:
+                correct_option, marks = context.questions[question_id]
+                is_correct = selected_option == correct_option
+                valid.append((question_id, selected_option, correct_option, marks))
+                results.append({
+                    "question_id": question_id,
+                    "selected_option": selected_option,
+                    "saved": True,
+                    "is_correct": is_correct,
+                    "marks_awarded": marks if is_correct else 0,
+                })
+                continue
+
+            results.append({
+                "question_id": question_id,
+                "selected_option": selected_option,
+                "saved": False,
+                "detail": detail,
+            })
+
+        # 🔹 One bulk upsert (or buffer append) for every valid answer
+        if not save_answers(context.attempt_id, valid, context.order):
             return Response(
-                {"detail": "Question does not belong to this test attempt."},
+                {"detail": "Test already submitted."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # 🔹 Save or update answer
-        is_correct = selected_option == question.correct_option
-        # Save selected option and correctness
-        answer, _ = UserAnswer.objects.update_or_create(
-            attempt=attempt,
-            question=question,
-            defaults={"selected_option": selected_option, "is_correct": is_correct}
-        )
-        marks_awarded = question.marks if is_correct else 0
-
         return Response({
-            "message": "Answer saved successfully.",
-            "attempt_id": attempt.id,
-            "question_id": question.id,
-            "selected_option": selected_option,
-            "is_correct": is_correct,
-            "marks_awarded": marks_awarded,
-            "time_left": attempt.time_left()
-        }, status=200)
+            "message": f"{len(valid)} of {len(answers)} answers saved.",
+            "attempt_id": context.attempt_id,
+            "results": results,
+            "time_left": context.time_left()
+        }, status=status.HTTP_200_OK)
 
     
     
@@ -319,17 +494,66 @@ class TestResultAPIView(APIView):
     permission_classes = [IsAuthenticated , IsNormalUser]
 
     def get(self, request, attempt_id):
-        try:
-            attempt = TestAttempt.objects.get(id=attempt_id, user=request.user)
-        except TestAttempt.DoesNotExist:
+        document = get_result_document(attempt_id, request.user.id)
+        if document is None:
             return Response({"detail": "Test attempt not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = TestResultSerializer(attempt)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Stored results are already JSON, send them without re-encoding
+        return HttpResponse(document, content_type="application/json")
     
 
 
 
+class TestCatalogueAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        catalogue = get_catalogue()
+        # Unchanged since the client's copy: nothing to send
+        if catalogue["etag"] in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(catalogue["json"], content_type="application/json")
+        response["ETag"] = catalogue["etag"]
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+
+class DashboardSummaryAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsNormalUser]
+
+    def get(self, request):
+        return Response(get_dashboard_summary(request.user.id), status=status.HTTP_200_OK)
+
+
+class AttemptHistoryAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsNormalUser]
+
+    def get(self, request):
+        # 🔹 Keyset pagination on (history_at, id)
+        paginator = AttemptHistoryPagination()
+        page = paginator.paginate_queryset(attempt_history(request.user.id), request)
+        serializer = AttemptHistorySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class TestLeaderboardAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsNormalUser]
+
+    def get(self, request, test_id):
+        test = get_object_or_404(Test, id=test_id)
+        queryset = TestAttempt.objects.filter(test=test, status="COMPLETED").select_related("user").only(
+            "id", "score", "percentage", "time_taken_seconds", "completed_at", "user__username"
+        )
+
+        # 🔹 Keyset pagination on (score, completed_at, id)
+        paginator = LeaderboardPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        distribution = ScoreDistribution.objects.filter(test=test).first()
+        serializer = LeaderboardEntrySerializer(page, many=True, context={"distribution": distribution})
+        return paginator.get_paginated_response(serializer.data)
+
+
 class AdminTestResultsAPIView(APIView):
     permission_classes = [IsAuthenticated,IsAdminUser]
 
@@ -338,29 +562,10 @@ class AdminTestResultsAPIView(APIView):
             "user", "test"
         )
 
-        # 🔹 Filters
-        test_id = request.query_params.get("test")
-        user_id = request.query_params.get("user")
-        result = request.query_params.get("result")  # pass / fail
-
-        if test_id:
-            queryset = queryset.filter(test_id=test_id)
-
-        if user_id:
-            queryset = queryset.filter(user_id=user_id)
-
-        if result == "pass":
-            queryset = [
-                attempt for attempt in queryset
-                if attempt.calculate_pass_fail()["passed"]
-            ]
-        elif result == "fail":
-            queryset = [
-                attempt for attempt in queryset
-                if not attempt.calculate_pass_fail()["passed"]
-            ]
-
-        # 🔹 Pagination
+        # 🔹 Filters (all in SQL)
+        queryset = filter_admin_results(queryset, request.query_params)
+
+        # 🔹 Keyset pagination on (completed_at, id)
         paginator = AdminResultsPagination()
         page = paginator.paginate_queryset(queryset, request)
 
@@ -369,44 +574,23 @@ class AdminTestResultsAPIView(APIView):
 
 
 class AdminTestResultsCSVExportAPIView(APIView):
+    """
+    Stream every attempt matching the admin results filters as CSV.
+    Rows are read in chunks through a server-side cursor, so memory stays
+    flat for exports of any size.
+    """
     permission_classes = [IsAuthenticated,IsAdminUser]
 
     def get(self, request):
-        attempts = TestAttempt.objects.all().order_by("-started_at")
+        # Filters are validated here, before the first byte is streamed
+        queryset = results_export_queryset(request.query_params)
 
-        response = HttpResponse(content_type='text/csv')
+        response = StreamingHttpResponse(
+            csv_chunks(RESULTS_HEADER, result_rows(queryset)),
+            content_type="text/csv"
+        )
         response['Content-Disposition'] = 'attachment; filename="test_attempts.csv"'
-
-        writer = csv.writer(response)
-        # Header
-        writer.writerow([
-            "ID", "User", "Test", "Score", "Max Score", "Percentage",
-            "Status", "Passed", "Time Taken", "Started At", "Completed At"
-        ])
-
-        for attempt in attempts:
-            max_score = sum(category.question_set.count() for category in attempt.categories.all())
-            percentage = round((attempt.score / max_score) * 100, 2) if max_score > 0 else 0
-            passed = percentage >= getattr(attempt.test, "passing_percentage", 40)
-            time_taken = ""
-            if attempt.completed_at:
-                total_seconds = int((attempt.completed_at - attempt.started_at).total_seconds())
-                minutes, seconds = divmod(total_seconds, 60)
-                time_taken = f"{minutes} min {seconds} sec"
-
-            writer.writerow([
-                attempt.id,
-                attempt.user.username,
-                attempt.test.name,
-                attempt.score,
-                max_score,
-                percentage,
-                attempt.status,
-                "PASS" if passed else "FAIL",
-                time_taken,
-                attempt.started_at,
-                attempt.completed_at
-            ])
+        return response
 
 
 class ExportAttemptCSVAPIView(APIView):
@@ -415,7 +599,7 @@ class ExportAttemptCSVAPIView(APIView):
 
     def get(self, request, attempt_id):
         try:
-            attempt = TestAttempt.objects.get(id=attempt_id)
+            attempt = TestAttempt.objects.select_related("user", "test").get(id=attempt_id)
         except TestAttempt.DoesNotExist:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -425,58 +609,97 @@ class ExportAttemptCSVAPIView(APIView):
             return Response({"detail": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
 
         # build CSV
-        import io
-        def stream():
-            out = io.StringIO()
-            writer = csv.writer(out)
-            # Attempt summary header
-            writer.writerow(["ID","User","Test","Score","Max Score","Percentage","Status","Passed","Time Taken","Started At","Completed At"])
-            yield out.getvalue(); out.seek(0); out.truncate(0)
-
-            max_score = sum(category.question_set.count() for category in attempt.categories.all())
-            percentage = round((attempt.score / max_score) * 100, 2) if max_score > 0 else 0
-            passed = attempt.calculate_pass_fail()["passed"]
-            time_taken = ""
-            if attempt.completed_at:
-                total_seconds = int((attempt.completed_at - attempt.started_at).total_seconds())
-                minutes, seconds = divmod(total_seconds, 60)
-                time_taken = f"{minutes} min {seconds} sec"
-            writer.writerow([attempt.id, attempt.user.username, attempt.test.name, attempt.score, max_score, percentage, attempt.status, "PASS" if passed else "FAIL", time_taken, attempt.started_at, attempt.completed_at])
-            yield out.getvalue(); out.seek(0); out.truncate(0)
-
-            # Per-question details
-            writer.writerow([])
-            writer.writerow(["Question ID","Question Text","Selected Option","Selected Value","Correct Option","Correct Value","Is Correct","Marks"])
-            yield out.getvalue(); out.seek(0); out.truncate(0)
-
-            # collect questions in attempt order
-            questions = []
-            for cat in attempt.categories.prefetch_related('question_set'):
-                for q in cat.question_set.all().distinct():
-                    if q.id not in [x.id for x in questions]:
-                        questions.append(q)
-
-            for q in questions:
-                ans = attempt.answers.filter(question=q).first()
-                sel = ans.selected_option if ans else ''
-                sel_text = ''
-                if sel == 'A': sel_text = q.option_a
-                elif sel == 'B': sel_text = q.option_b
-                elif sel == 'C': sel_text = q.option_c
-                elif sel == 'D': sel_text = q.option_d
-                corr = q.correct_option
-                corr_text = q.option_a if corr=='A' else (q.option_b if corr=='B' else (q.option_c if corr=='C' else q.option_d))
-                is_corr = 'TRUE' if ans and ans.is_correct else 'FALSE'
-                writer.writerow([q.id, q.question_text, sel, sel_text, corr, corr_text, is_corr, q.marks])
-                yield out.getvalue(); out.seek(0); out.truncate(0)
-
+        stream = csv_chunks(RESULTS_HEADER, attempt_rows(attempt), rows_per_chunk=100)
         filename = f"attempt_{attempt.id}.csv"
-        response = StreamingHttpResponse(stream(), content_type="text/csv")
+        response = StreamingHttpResponse(stream, content_type="text/csv")
         response["Content-Disposition"] = f'attachment; filename="{filename}"'
         return response
 
+
+class AdminExportJobsAPIView(APIView):
+    """
+    Queue an export for the background worker (POST) or list recent ones (GET).
+
+    POST ``{"kind": "results", "params": {...results filters}}`` or
+    ``{"kind": "test_bundle", "params": {"test": id}}``. An identical export
+    that is still pending or running is returned instead of a new job.
+    """
+    permission_classes = [IsAuthenticated,IsAdminUser]
+
+    def get(self, request):
+        jobs = ExportJob.objects.order_by("-created_at")[:50]
+        return Response(ExportJobSerializer(jobs, many=True).data)
+
+    def post(self, request):
+        kind = request.data.get("kind")
+        params = request.data.get("params") or {}
+        if not isinstance(params, dict):
+            return Response({"detail": "params must be an object."}, status=status.HTTP_400_BAD_REQUEST)
+
+        job, created = submit_export(request.user, kind, params)
+        return Response(
+            ExportJobSerializer(job).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class AdminExportJobDetailAPIView(APIView):
+    permission_classes = [IsAuthenticated,IsAdminUser]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ExportJob, id=job_id)
+        return Response(ExportJobSerializer(job).data)
+
+
+class AdminExportJobDownloadAPIView(APIView):
+    """Download a finished export; honours a single ``Range: bytes=`` header."""
+    permission_classes = [IsAuthenticated,IsAdminUser]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ExportJob, id=job_id)
+        if job.status != "DONE":
+            return Response({"detail": "Export is not ready."}, status=status.HTTP_409_CONFLICT)
+
+        path = job_path(job)
+        if not path.exists():
+            return Response({"detail": "Export file is gone."}, status=status.HTTP_410_GONE)
+        return ranged_file_response(request, path, job.file_name, "application/gzip")
+
+
+def ranged_file_response(request, path, filename, content_type):
+    size = path.stat().st_size
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", request.headers.get("Range", "").strip())
+    if not match or match.groups() == ("", ""):
+        response = FileResponse(open(path, "rb"), as_attachment=True, filename=filename, content_type=content_type)
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        # "bytes=-N" is the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    if start > end:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response["Content-Range"] = f"bytes */{size}"
         return response
-    
-    
 
+    def chunks():
+        with open(path, "rb") as file:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining:
+                data = file.read(min(64 * 1024, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+    response = StreamingHttpResponse(chunks(), status=status.HTTP_206_PARTIAL_CONTENT, content_type=content_type)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(end - start + 1)
+    response["Accept-Ranges"] = "bytes"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
 